@@ -1,3 +1,5 @@
+from functools import partial
+
 from admin_auto_filters.filters import AutocompleteFilter
 from django import forms
 from django.contrib import admin, messages
@@ -6,28 +8,41 @@ from django.contrib.admin.widgets import (
 )
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.exceptions import PermissionDenied
 from django.db import models
-from django.db.models import JSONField, Q
+from django.db.models import JSONField
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect, render
 from django.urls import path, reverse
-from django.utils.text import slugify
 from django.utils.timezone import now
 from django_admin_relation_links import AdminChangeLinksMixin
 from import_export import fields
 from import_export.admin import ImportExportModelAdmin
+from import_export.forms import ConfirmImportForm, ImportForm
+from import_export.instance_loaders import CachedInstanceLoader
 from import_export.resources import ModelResource
 from jsoneditor.forms import JSONEditor
 
 from .models import (
+    HISTOGRAM_BUCKETS,
+    AssignmentJob,
     Category,
     Question,
     Response,
+    ResponseOutbox,
     Survey,
     UserSurvey,
     UserSurveyNotification,
+    get_response_stat_attributes,
+    schedule_task_rebuild,
 )
 from .resources import HashIdWidget
+from .settings import api_settings
+from .streaming import (
+    STREAMING_FORMATS,
+    iter_export_rows,
+    streaming_export_response,
+)
 
 User = get_user_model()
 
@@ -73,29 +88,30 @@ class SurveyUsersForm(forms.Form):
     )
 
     def save(self, survey):
-        users = self.cleaned_data["users"]
-        groups = self.cleaned_data["groups"]
-
-        created_user_surveys = []
-        for user in User.objects.filter(
-            Q(groups__in=groups) | Q(id__in=users.values("id"))
-        ):
-            user_survey, created = UserSurvey.objects.get_or_create(
-                user=user, survey=survey
-            )
-            if created:
-                created_user_surveys.append(user_survey)
-        return created_user_surveys
+        job = AssignmentJob.objects.create(survey=survey)
+        job.users.set(self.cleaned_data["users"])
+        job.groups.set(self.cleaned_data["groups"])
+        return job
 
 
 class QuestionResource(ModelResource):
-    instances_to_keep = set()
     id = fields.Field(column_name="id", attribute="id", widget=HashIdWidget())
 
     class Meta:
         model = Question
         fields = ["id", "question", "text", "type", "format"]
         export_order = fields
+        # One query loads the existing questions, rows are saved in batches
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        batch_size = 1000
+
+    def get_bulk_update_fields(self):
+        return [*super().get_bulk_update_fields(), "sequence"]
+
+    def before_import(self, dataset, **kwargs):
+        # Existing questions updated by this import
+        self.instances_to_keep = set()
 
     def before_import_row(self, row, row_number=None, **kwargs):
         # Clean IDs if we are importing questions from another survey
@@ -107,19 +123,27 @@ class QuestionResource(ModelResource):
     def skip_row(self, instance, original, row, import_validation_errors=None):
         return not instance.question
 
-    def after_import_instance(self, instance, new, row_number=None, **kwargs):
+    def after_init_instance(self, instance, new, row, **kwargs):
         instance.survey_id = kwargs["survey"].id
-        instance.sequence = row_number
-
-    def after_save_instance(self, instance, using_transactions, dry_run):
-        self.instances_to_keep.add(instance.id)
-
-    def after_import(self, dataset, result, using_transactions, dry_run, **kwargs):
-        # TODO: uncomment if we want to remove questions that are not in the file
-        # Question.objects.filter(survey_id=kwargs["survey_id"]).exclude(
-        #     id__in=self.instances_to_keep
-        # ).delete()
-        pass
+        instance.sequence = kwargs["row_number"]
+
+    def after_save_instance(self, instance, row, **kwargs):
+        if instance.pk is not None:
+            self.instances_to_keep.add(instance.pk)
+
+    def after_import(self, dataset, result, **kwargs):
+        if kwargs.get("dry_run") and not kwargs.get("using_transactions"):
+            return
+        survey_id = kwargs["survey"].id
+        if kwargs.get("sync") and not result.has_errors():
+            # Remove the questions that are not in the file
+            Question.objects.filter(
+                survey_id=survey_id,
+                id__in=kwargs["question_ids"] - self.instances_to_keep,
+            ).delete()
+        # Bulk saves do not send post_save
+        if api_settings.AUTO_GENERATE_TASKS:
+            schedule_task_rebuild(survey_id, self.get_db_connection_name())
 
 
 class QuestionResponseResource(ModelResource):
@@ -146,14 +170,40 @@ class QuestionResponseStatResource(ModelResource):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.survey = kwargs["survey"]
-        for response in self.survey.question_set.all().get_responses():
-            if response_slug := slugify(response):
-                self.fields[response_slug] = fields.Field(
-                    column_name=f"#{response}", attribute=response_slug
-                )
-                self.fields[f"{response_slug}_p"] = fields.Field(
-                    column_name=f"%{response}", attribute=f"{response_slug}_p"
-                )
+        responses = self.survey.question_set.all().get_responses()
+        for attribute, response in get_response_stat_attributes(responses).items():
+            self.fields[attribute] = fields.Field(
+                column_name=f"#{response}", attribute=attribute
+            )
+            self.fields[f"{attribute}_p"] = fields.Field(
+                column_name=f"%{response}", attribute=f"{attribute}_p"
+            )
+
+
+class QuestionResponseAnalyticsResource(ModelResource):
+    count = fields.Field(column_name="count", attribute="analytics__count")
+    min = fields.Field(column_name="min", attribute="analytics__min")
+    max = fields.Field(column_name="max", attribute="analytics__max")
+    mean = fields.Field(column_name="mean", attribute="analytics__mean")
+    median = fields.Field(column_name="median", attribute="analytics__median")
+
+    class Meta:
+        model = Question
+        fields = ["question", "type", "count", "min", "max", "mean", "median"]
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        for index in range(HISTOGRAM_BUCKETS):
+            self.fields[f"bucket_{index}"] = fields.Field(
+                column_name=f"bucket {index + 1}",
+                dehydrate_method=partial(self.dehydrate_bucket, index=index),
+            )
+
+    def dehydrate_bucket(self, question, index):
+        if question.analytics and index < len(question.analytics.histogram):
+            first, last, count = question.analytics.histogram[index]
+            return f"{first}..{last}: {count}"
+        return None
 
 
 class QuestionResponseExport(ImportExportModelAdmin):
@@ -171,11 +221,26 @@ class QuestionResponseExport(ImportExportModelAdmin):
         }
 
     def get_export_filename(self, request, queryset, file_format):
+        return self.get_streaming_export_filename(request, file_format.get_extension())
+
+    def get_streaming_export_filename(self, request, extension):
         return "%s-%s-%s.%s" % (
             request.kwargs["survey"].title,
             request.path.strip("/").split("/")[-1].replace("export_question_", ""),
             now().strftime("%Y-%m-%d"),
-            file_format.get_extension(),
+            extension,
+        )
+
+    def streaming_export_action(self, request, file_format):
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+
+        resource = self.resource_class(**self.get_export_resource_kwargs(request))
+        rows = iter_export_rows(resource, self.get_export_queryset(request))
+        return streaming_export_response(
+            rows,
+            file_format,
+            self.get_streaming_export_filename(request, file_format),
         )
 
 
@@ -186,10 +251,29 @@ class QuestionResponseStatExport(QuestionResponseExport):
         return request.kwargs["survey"].get_responses_stats()
 
 
+class QuestionResponseAnalyticsExport(QuestionResponseExport):
+    resource_class = QuestionResponseAnalyticsResource
+
+    def get_export_queryset(self, request):
+        return request.kwargs["survey"].get_responses_analytics()
+
+
+class QuestionImportForm(ImportForm):
+    sync = forms.BooleanField(
+        label="Delete the questions missing from the file", required=False
+    )
+
+
+class QuestionConfirmImportForm(ConfirmImportForm):
+    sync = forms.BooleanField(widget=forms.HiddenInput(), required=False)
+
+
 class QuestionImportExport(ImportExportModelAdmin):
     model = Question
     import_template_name = "admin/df_survey/survey/import_questions.html"
     export_template_name = "admin/df_survey/survey/export_questions.html"
+    import_form_class = QuestionImportForm
+    confirm_form_class = QuestionConfirmImportForm
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -197,12 +281,20 @@ class QuestionImportExport(ImportExportModelAdmin):
 
     resource_class = QuestionResource
 
-    def get_import_data_kwargs(self, request, *args, **kwargs):
+    def get_confirm_form_initial(self, request, import_form):
+        initial = super().get_confirm_form_initial(request, import_form)
+        if import_form is not None:
+            initial["sync"] = import_form.cleaned_data["sync"]
+        return initial
+
+    def get_import_data_kwargs(self, request, **kwargs):
         survey = request.kwargs["survey"]
+        form = kwargs.get("form")
         return {
-            **super().get_import_data_kwargs(request, *args, **kwargs),
+            **super().get_import_data_kwargs(request=request, **kwargs),
             "survey": survey,
             "question_ids": set(survey.question_set.all().values_list("id", flat=True)),
+            "sync": bool(form and form.cleaned_data.get("sync")),
         }
 
     def get_export_queryset(self, request):
@@ -242,11 +334,21 @@ class SurveyAdmin(admin.ModelAdmin):
         "users_total",
         "users_completed",
     )
+    list_select_related = ("category",)
     list_filter = ("category__slug",)
 
     def get_queryset(self, request):
         return super().get_queryset(request).annotate_stats()
 
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        # Streamed exports are linked from the change form: the export pages
+        # of the responses need a survey to build their resource
+        extra_context = {
+            "streaming_formats": list(STREAMING_FORMATS),
+            **(extra_context or {}),
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
+
     def users_total(self, obj):
         return obj.users_total
 
@@ -270,6 +372,13 @@ class SurveyAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.export_question_responses_stat_view),
                 name="df_survey_survey_export_question_responses_stat",
             ),
+            path(
+                "<str:survey_id>/export_question_responses_analytics/",
+                self.admin_site.admin_view(
+                    self.export_question_responses_analytics_view
+                ),
+                name="df_survey_survey_export_question_responses_analytics",
+            ),
             path(
                 "<str:survey_id>/import_questions/",
                 self.admin_site.admin_view(self.import_questions_view),
@@ -299,12 +408,10 @@ class SurveyAdmin(admin.ModelAdmin):
         if request.method == "POST":
             form = SurveyUsersForm(request.POST)
             if form.is_valid():
-                user_surveys = form.save(survey=request.kwargs["survey"])
-                if len(user_surveys) > 0:
+                if form.cleaned_data["users"] or form.cleaned_data["groups"]:
+                    form.save(survey=request.kwargs["survey"])
                     messages.success(
-                        request,
-                        "Successfully assigned %s users to the survey"
-                        % len(user_surveys),
+                        request, "Assignment of the survey to users has been queued"
                     )
                 else:
                     messages.warning(request, "No users were assigned to the survey")
@@ -337,12 +444,26 @@ class SurveyAdmin(admin.ModelAdmin):
     def export_question_responses_view(self, request, **kwargs):
         # Redirect to the generic export view with a context tailored for the specific survey
         self.set_request_kwargs(request, **kwargs)
-        return QuestionResponseExport(Survey, admin.site).export_action(request)
+        return self.run_export(request, QuestionResponseExport(Survey, admin.site))
 
     def export_question_responses_stat_view(self, request, **kwargs):
         # Redirect to the generic export view with a context tailored for the specific survey
         self.set_request_kwargs(request, **kwargs)
-        return QuestionResponseStatExport(Survey, admin.site).export_action(request)
+        return self.run_export(request, QuestionResponseStatExport(Survey, admin.site))
+
+    def export_question_responses_analytics_view(self, request, **kwargs):
+        # Redirect to the generic export view with a context tailored for the specific survey
+        self.set_request_kwargs(request, **kwargs)
+        return self.run_export(
+            request, QuestionResponseAnalyticsExport(Survey, admin.site)
+        )
+
+    def run_export(self, request, export_admin):
+        # ?stream=csv|xlsx writes rows as they are read instead of building
+        # the whole dataset in memory first
+        if file_format := request.GET.get("stream"):
+            return export_admin.streaming_export_action(request, file_format)
+        return export_admin.export_action(request)
 
     def export_questions_view(self, request, **kwargs):
         # Redirect to the generic export view with a context tailored for the specific survey
@@ -368,13 +489,17 @@ class SurveyAdmin(admin.ModelAdmin):
 
     @admin.action(description="Assign this survey to all users")
     def create_for_all_users(self, request, queryset):
-        for survey in queryset:
-            UserSurvey.objects.create_for_users(survey=survey, users=None)
+        jobs = AssignmentJob.objects.bulk_create(
+            [AssignmentJob(survey=survey, all_users=True) for survey in queryset]
+        )
+        messages.success(
+            request, "Queued assignment of %s surveys to all users" % len(jobs)
+        )
 
+    @admin.action(description="Regenerate the tasks from the questions")
     def generate_tasks(self, request, queryset):
-        for survey in queryset:
-            survey.generate_task()
-            survey.save()
+        updated = queryset.generate_tasks()
+        messages.success(request, "Updated the tasks of %s surveys" % updated)
 
     actions = [create_for_all_users, generate_tasks]
 
@@ -386,6 +511,9 @@ class ResponseInline(ReadOnlyInline):
     model = Response
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("question")
+
 
 class SurveyFilter(AutocompleteFilter):
     title = "Survey"
@@ -405,18 +533,23 @@ class UserSurveyAdmin(AdminChangeLinksMixin, admin.ModelAdmin):
         "user",
         "created",
         "modified",
+        "completed_at",
     )
     change_links = ["survey"]
     list_filter = (
         SurveyFilter,
         "survey__category__slug",
-        ("result", admin.EmptyFieldListFilter),
+        ("completed_at", admin.EmptyFieldListFilter),
     )
     search_fields = ("user__email", "survey__title")
 
+    def get_queryset(self, request):
+        # The changelist skips list_select_related when the manager already
+        # selects related objects
+        return super().get_queryset(request).select_related("user")
+
     def parse_survey_response(self, request, queryset):
-        for user_survey in queryset:
-            user_survey.parse_survey_response()
+        UserSurvey.objects.parse_survey_responses(queryset)
 
     def send_notifications(self, request, queryset):
         for user_survey in queryset:
@@ -429,6 +562,41 @@ class UserSurveyAdmin(AdminChangeLinksMixin, admin.ModelAdmin):
         css = {"all": ("df_survey/admin/css/user_surveys.css",)}
 
 
+@admin.register(AssignmentJob)
+class AssignmentJobAdmin(AdminChangeLinksMixin, admin.ModelAdmin):
+    list_display = (
+        "id",
+        "survey_link",
+        "status",
+        "users_assigned",
+        "users_total",
+        "created",
+        "modified",
+    )
+    list_select_related = ("survey",)
+    change_links = ["survey"]
+    list_filter = ("status",)
+    autocomplete_fields = ["survey", "users", "groups"]
+    readonly_fields = (
+        "users_total",
+        "users_assigned",
+        "last_user_id",
+        "error",
+    )
+
+
+@admin.register(ResponseOutbox)
+class ResponseOutboxAdmin(admin.ModelAdmin):
+    list_display = ("usersurvey", "created", "available_at", "attempts", "last_error")
+    autocomplete_fields = ("usersurvey",)
+
+    @admin.action(description="Retry now")
+    def retry(self, request, queryset):
+        queryset.update(attempts=0, available_at=now(), last_error="")
+
+    actions = [retry]
+
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ("question", "type", "format")
@@ -0,0 +1,121 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from ..settings import api_settings
+
+
+class UserSurveyCursorPagination(BasePagination):
+    """
+    Keyset pagination on ``(modified, pk)``, newest first.
+
+    Pages are selected with a ``WHERE (modified, pk) < (cursor)`` condition
+    instead of an OFFSET, so every page costs the same as the first one.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+
+        if position is None:
+            queryset = queryset.order_by("-modified", "-pk")
+        elif reverse:
+            modified, pk = position
+            queryset = queryset.filter(
+                Q(modified__gt=modified) | Q(modified=modified, pk__gt=pk)
+            ).order_by("modified", "pk")
+        else:
+            modified, pk = position
+            queryset = queryset.filter(
+                Q(modified__lt=modified) | Q(modified=modified, pk__lt=pk)
+            ).order_by("-modified", "-pk")
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self.get_position(results[-1])
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_position(self, item):
+        # Items are model instances or dicts from a values() queryset
+        if isinstance(item, dict):
+            return item["modified"], item["pk"]
+        return item.modified, item.pk
+
+    def get_page_size(self, request):
+        page_size = api_settings.USER_SURVEY_PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+        return max(1, min(page_size, api_settings.USER_SURVEY_MAX_PAGE_SIZE))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            modified = parse_datetime(cursor["m"])
+            if modified is None:
+                raise ValueError
+            return bool(cursor["r"]), (modified, cursor["p"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        modified, pk = position
+        cursor = {"r": int(reverse), "m": modified.isoformat(), "p": str(pk)}
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -1,11 +1,9 @@
-import json
-
-from django.template import Context, Template
 from drf_spectacular.utils import extend_schema_field
 from hashid_field.rest import HashidSerializerCharField
 from rest_framework import serializers
 
 from ..models import UserSurvey
+from ..renderers import SurveyKitRenderer
 
 
 class UserSurveySerializer(serializers.ModelSerializer):
@@ -13,13 +11,7 @@ class UserSurveySerializer(serializers.ModelSerializer):
     title = serializers.CharField(source="survey.title", read_only=True)
     description = serializers.CharField(source="survey.description", read_only=True)
     category = serializers.CharField(source="survey.category.slug", read_only=True)
-    completed = serializers.DateTimeField(read_only=True)
-
-    def to_representation(self, instance):
-        attrs = super().to_representation(instance)
-        if instance.result:
-            attrs["completed"] = instance.modified
-        return attrs
+    completed = serializers.DateTimeField(source="completed_at", read_only=True)
 
     class Meta:
         model = UserSurvey
@@ -33,6 +25,28 @@ class UserSurveySerializer(serializers.ModelSerializer):
         )
 
 
+class UserSurveyListSerializer(serializers.Serializer):
+    """
+    Same representation as UserSurveySerializer, read from the dicts of
+    ``UserSurveyQuerySet.values_for_list`` instead of model instances.
+    """
+
+    created = serializers.DateTimeField(read_only=True)
+    modified = serializers.DateTimeField(read_only=True)
+    id = HashidSerializerCharField(source="pk", read_only=True)
+    title = serializers.CharField(read_only=True)
+    category = serializers.CharField(read_only=True)
+    description = serializers.CharField(read_only=True)
+    completed = serializers.DateTimeField(read_only=True)
+
+    def to_representation(self, instance):
+        attrs = super().to_representation(instance)
+        # UserSurveySerializer leaves the category out when it is unset
+        if attrs["category"] is None:
+            del attrs["category"]
+        return attrs
+
+
 class UserSurveyDetailsSerializer(UserSurveySerializer):
     task = serializers.SerializerMethodField("get_task")
     result = serializers.JSONField(required=False)
@@ -47,9 +61,7 @@ class UserSurveyDetailsSerializer(UserSurveySerializer):
 
     @extend_schema_field(serializers.JSONField)
     def get_task(self, obj: UserSurvey):
-        template = Template(json.dumps(obj.survey.task))
-        task_str = template.render(Context({"user": obj.user}))
-        task = json.loads(task_str)
+        task = SurveyKitRenderer.render_task(obj.survey, {"user": obj.user})
 
         results = {res.step_id: res for res in obj.pretty_results()}
 
@@ -1,10 +1,21 @@
-from df_notifications.decorators import disable_notification_signal
-from rest_framework import mixins
-from rest_framework.exceptions import ValidationError
+import hashlib
+
+from django.http import Http404
+from django.utils.cache import parse_etags
+from rest_framework import mixins, status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from ..models import UserSurvey
-from .serializers import UserSurveyDetailsSerializer, UserSurveySerializer
+from ..models import AlreadySubmitted, UserSurvey
+from ..settings import api_settings
+from .serializers import UserSurveyDetailsSerializer, UserSurveyListSerializer
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Your submission has already been recorded."
+    default_code = "conflict"
 
 
 class UserSurveyViewSet(
@@ -15,30 +26,107 @@ class UserSurveyViewSet(
 ):
     serializer_class = UserSurveyDetailsSerializer
     queryset = UserSurvey.objects.all()
+    # The project's default pagination unless DF_SURVEY selects another one
+    pagination_class = (
+        api_settings.USER_SURVEY_PAGINATION_CLASS or GenericViewSet.pagination_class
+    )
+    # Everything the representation depends on except the large JSON columns,
+    # which are covered by UserSurvey.modified and Survey.task_hash
+    etag_fields = (
+        "pk",
+        "modified",
+        "survey__title",
+        "survey__description",
+        "survey__category__slug",
+        "survey__task_hash",
+    )
 
     def get_queryset(self):
-        return self.queryset.filter(
+        queryset = self.queryset.filter(
             user=self.request.user,
             survey__task__isnull=False,
         )
+        if self.action == "list":
+            return queryset.values_for_list()
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
-            return UserSurveySerializer
+            return UserSurveyListSerializer
         return self.serializer_class
 
     def perform_update(self, serializer):
-        if serializer.instance.result:
-            raise ValidationError("Your submission has already been recorded.")
-        return super().perform_update(serializer)
+        user_survey = serializer.instance
+        result = serializer.validated_data.get("result")
+        try:
+            if result is not None:
+                user_survey.submit(result)
+            elif user_survey.completed_at is not None:
+                raise AlreadySubmitted()
+            else:
+                super().perform_update(serializer)
+        except AlreadySubmitted:
+            raise Conflict()
 
     def get_object(self):
         pk = self.kwargs.get("pk", "")
         if pk.startswith("@"):
-            survey_pk = pk[1:]
-            with disable_notification_signal(UserSurvey):
-                return UserSurvey.objects.get_or_create(
-                    user=self.request.user,
-                    survey_id=survey_pk,
-                )[0]
+            try:
+                user_survey = UserSurvey.objects.get_or_assign(
+                    self.request.user, pk[1:]
+                )
+            except UserSurvey.DoesNotExist:
+                raise Http404()
+            self.check_object_permissions(self.request, user_survey)
+            return user_survey
         return super().get_object()
+
+    def get_etag(self):
+        queryset = self.get_queryset().values(*self.etag_fields)
+        pk = self.kwargs.get("pk")
+        if pk is not None:
+            if pk.startswith("@"):
+                queryset = queryset.filter(survey_id=pk[1:])
+            else:
+                queryset = queryset.filter(pk=pk)
+            rows = list(queryset)
+            if not rows:
+                return None
+        else:
+            rows = None
+            if self.paginator is not None:
+                # Only the rows of the requested page, so that a page costs the
+                # same whatever the number of user surveys
+                paginator = self.pagination_class()
+                rows = paginator.paginate_queryset(queryset, self.request, view=self)
+            if rows is None:
+                # Not paginated, as the response
+                rows = queryset
+            else:
+                rows += [
+                    getattr(paginator, "count", None),
+                    paginator.get_next_link(),
+                    paginator.get_previous_link(),
+                ]
+
+        digest = hashlib.sha256(self.request.get_full_path().encode())
+        for row in rows:
+            digest.update(repr(row).encode())
+        return f'"{digest.hexdigest()}"'
+
+    def conditional_response(self, request, action, *args, **kwargs):
+        etag = self.get_etag()
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag and (etag in etags or "*" in etags):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response = action(request, *args, **kwargs)
+        if etag and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from df_survey.models import ResponseOutbox
+
+
+class Command(BaseCommand):
+    help = "Parse survey results queued in the response outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the outbox is drained instead of polling for new entries",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=1.0, help="Seconds between polls"
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=None)
+
+    def handle(
+        self, *args, once=False, sleep=1.0, batch_size=100, max_attempts=None, **options
+    ):
+        while True:
+            processed = ResponseOutbox.objects.process(
+                batch_size=batch_size, max_attempts=max_attempts
+            )
+            if processed:
+                self.stdout.write(f"Processed {processed} outbox entries")
+            elif once:
+                return
+            else:
+                time.sleep(sleep)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from df_survey.models import Survey, SurveyStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild stored survey completion counters from UserSurvey rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "survey_ids", nargs="*", help="Surveys to rebuild, all if omitted"
+        )
+
+    def handle(self, *args, survey_ids=None, **options):
+        surveys = Survey.objects.all()
+        if survey_ids:
+            surveys = surveys.filter(pk__in=survey_ids)
+
+        count = SurveyStats.objects.rebuild(surveys)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} surveys"))
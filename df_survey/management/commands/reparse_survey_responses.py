@@ -0,0 +1,152 @@
+import json
+import multiprocessing
+import os
+import time
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from df_survey.models import UserSurvey
+from df_survey.utils import batched
+
+
+def init_worker():
+    # Spawned workers start with a fresh interpreter, forked ones inherit a
+    # closed connection; either way each worker opens its own connection
+    if not apps.ready:
+        django.setup()
+
+
+def reparse_range(task):
+    index, start, end, surveys = task
+    # Ranges of the selected surveys also hold the ids of other surveys
+    user_surveys = UserSurvey.objects.filter(pk__gte=start, pk__lte=end)
+    if surveys:
+        user_surveys = user_surveys.filter(survey_id__in=surveys)
+    return index, UserSurvey.objects.parse_survey_responses(user_surveys)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse stored UserSurvey results into Response rows, in keyset "
+        "ranges processed by a pool of workers, resuming from a checkpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--survey",
+            action="append",
+            dest="surveys",
+            default=[],
+            help="Only reparse results of this survey (can be repeated)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of user surveys per keyset range",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes, 1 runs in the current process",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default="reparse_survey_responses.json",
+            help="File recording planned and completed ranges",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and plan the ranges again",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = self.load_checkpoint(options)
+        ranges = checkpoint["ranges"]
+        done = set(checkpoint["done"])
+        pending = [
+            (index, start, end, checkpoint["surveys"])
+            for index, (start, end) in enumerate(ranges)
+            if index not in done
+        ]
+        self.stdout.write(
+            f"{len(pending)} of {len(ranges)} ranges left, "
+            f"checkpoint {options['checkpoint']}"
+        )
+
+        rows = 0
+        started = time.monotonic()
+        for index, parsed in self.run(pending, options["processes"]):
+            rows += parsed
+            done.add(index)
+            checkpoint["done"] = sorted(done)
+            self.save_checkpoint(options["checkpoint"], checkpoint)
+
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"Range {index}: {parsed} rows, {len(done)}/{len(ranges)} "
+                    f"done, {self.throughput(rows, started):.1f} rows/s"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reparsed {rows} user surveys in {time.monotonic() - started:.1f}s "
+                f"({self.throughput(rows, started):.1f} rows/s)"
+            )
+        )
+
+    def run(self, pending, processes):
+        if processes <= 1:
+            for task in pending:
+                yield reparse_range(task)
+            return
+
+        connections.close_all()
+        with multiprocessing.Pool(processes, initializer=init_worker) as pool:
+            yield from pool.imap_unordered(reparse_range, pending)
+
+    def load_checkpoint(self, options):
+        path = options["checkpoint"]
+        surveys = sorted(options["surveys"])
+        if os.path.exists(path) and not options["restart"]:
+            with open(path) as file:
+                checkpoint = json.load(file)
+            if checkpoint["surveys"] != surveys:
+                raise CommandError(
+                    f"Checkpoint {path} was created for other surveys, "
+                    "use --restart to discard it"
+                )
+            return checkpoint
+
+        user_surveys = UserSurvey.objects.filter(completed_at__isnull=False)
+        if surveys:
+            user_surveys = user_surveys.filter(survey_id__in=surveys)
+        ids = (
+            user_surveys.order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=options["batch_size"])
+        )
+        checkpoint = {
+            "surveys": surveys,
+            "ranges": [
+                [str(batch[0]), str(batch[-1])]
+                for batch in batched(ids, options["batch_size"])
+            ],
+            "done": [],
+        }
+        self.save_checkpoint(path, checkpoint)
+        return checkpoint
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, path)
+
+    def throughput(self, rows, started):
+        return rows / max(time.monotonic() - started, 1e-9)
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from df_survey.models import ASSIGN_BATCH_SIZE, AssignmentJob
+
+
+class Command(BaseCommand):
+    help = "Process queued survey assignment jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no job is left instead of polling for new ones",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=5.0, help="Seconds between polls"
+        )
+        parser.add_argument("--batch-size", type=int, default=ASSIGN_BATCH_SIZE)
+
+    def handle(
+        self, *args, once=False, sleep=5.0, batch_size=ASSIGN_BATCH_SIZE, **options
+    ):
+        while True:
+            job = AssignmentJob.objects.claim()
+            if job is None:
+                if once:
+                    return
+                time.sleep(sleep)
+                continue
+
+            self.stdout.write(f"Processing assignment job {job.pk}: {job.survey}")
+            try:
+                job.run(batch_size=batch_size)
+            except Exception as e:
+                self.stderr.write(f"Assignment job {job.pk} failed: {e}")
+                continue
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Assignment job {job.pk} assigned {job.users_assigned} users"
+                )
+            )
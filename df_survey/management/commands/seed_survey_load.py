@@ -0,0 +1,286 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from df_survey.models import (
+    Category,
+    Question,
+    Response,
+    Survey,
+    SurveyStats,
+    UserSurvey,
+)
+from df_survey.renderers import SurveyKitRenderer
+from df_survey.utils import batched
+
+User = get_user_model()
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+CHOICES = [
+    ["Yes", "No", "Maybe"],
+    ["Never", "Rarely", "Sometimes", "Often", "Always"],
+    ["Red", "Green", "Blue", "Yellow", "Black", "White"],
+]
+ANSWER_TYPES = [
+    Question.Type.text,
+    Question.Type.integer,
+    Question.Type.date,
+    Question.Type.single,
+    Question.Type.multi,
+]
+DATE_RANGE = ("2020-01-01", "2024-12-31")
+STARTED = datetime(2024, 1, 1)
+
+
+def iso(value):
+    return value.isoformat(timespec="milliseconds")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a deterministic load of categories, surveys, users, results "
+        "and responses with bulk inserts, e.g. --users 6250 --completion 0.8 "
+        "creates a million responses"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--categories", type=int, default=3)
+        parser.add_argument("--surveys", type=int, default=10)
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=20,
+            help="Answered questions per survey, plus an intro and a completion step",
+        )
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--completion",
+            type=float,
+            default=0.8,
+            help="Share of the assigned users that submitted a result",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])  # noqa: S311
+        self.batch_size = options["batch_size"]
+        prefix = f"load{options['seed']}_"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users of seed {options['seed']} already exist, pick another --seed"
+            )
+
+        started = time.monotonic()
+        with transaction.atomic():
+            categories = Category.objects.bulk_create(
+                Category(slug=f"{prefix}category{i}")
+                for i in range(options["categories"])
+            )
+            surveys = [
+                self.create_survey(f"{prefix}survey{i}", i, categories, options)
+                for i in range(options["surveys"])
+            ]
+            users = self.create_users(prefix, options["users"])
+
+        responses = 0
+        for survey in surveys:
+            with transaction.atomic():
+                responses += self.create_user_surveys(
+                    survey, users, options["completion"]
+                )
+            self.stdout.write(f"{survey.title}: {responses} responses")
+        SurveyStats.objects.rebuild(
+            Survey.objects.filter(pk__in=[survey.pk for survey in surveys])
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(surveys)} surveys, {len(users)} users and "
+                f"{responses} responses in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    def create_survey(self, title, index, categories, options):
+        survey = Survey.objects.create(
+            title=title,
+            description=f"Load test survey {index}",
+            sequence=index,
+            category=categories[index % len(categories)] if categories else None,
+        )
+        questions = [
+            Question(
+                survey=survey,
+                sequence=0,
+                question="Welcome",
+                type=Question.Type.info,
+                format="intro|Start",
+            )
+        ]
+        for i in range(options["questions"]):
+            question_type = ANSWER_TYPES[i % len(ANSWER_TYPES)]
+            questions.append(
+                Question(
+                    survey=survey,
+                    sequence=i + 1,
+                    question=f"Question {i + 1}",
+                    text=" ".join(self.rng.choices(WORDS, k=8)),
+                    type=question_type,
+                    format=self.get_format(question_type),
+                )
+            )
+        questions.append(
+            Question(
+                survey=survey,
+                sequence=options["questions"] + 1,
+                question="Thank you",
+                type=Question.Type.info,
+                format="completion|Finish",
+            )
+        )
+        Question.objects.bulk_create(questions)
+
+        survey.task = SurveyKitRenderer.generate_task_from_survey(survey)
+        survey.save()
+        return survey
+
+    def get_format(self, question_type):
+        if question_type == Question.Type.integer:
+            return "0..10"
+        if question_type == Question.Type.date:
+            return "..".join(DATE_RANGE)
+        if question_type in (Question.Type.single, Question.Type.multi):
+            return "|".join(self.rng.choice(CHOICES))
+        return ""
+
+    def create_users(self, prefix, count):
+        for batch in batched(range(count), self.batch_size):
+            User.objects.bulk_create(
+                User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com")
+                for i in batch
+            )
+        return list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def create_user_surveys(self, survey, users, completion):
+        """Assign ``survey`` to ``users`` and submit results for a share of them."""
+        steps = survey.task["steps"]
+        questions = {
+            str(pk): pk for pk in survey.question_set.values_list("pk", flat=True)
+        }
+        now = timezone.now()
+        responses = 0
+
+        for batch in batched(users, self.batch_size):
+            user_surveys = []
+            for user_id in batch:
+                result = None
+                if self.rng.random() < completion:
+                    result = self.get_result(survey, steps)
+                user_surveys.append(
+                    UserSurvey(
+                        user_id=user_id,
+                        survey=survey,
+                        result=result,
+                        completed_at=now if result else None,
+                    )
+                )
+            UserSurvey.objects.bulk_create(user_surveys)
+            if user_surveys[0].pk is None:
+                # Not every backend returns the primary keys of bulk inserts
+                pks = dict(
+                    UserSurvey.objects.filter(
+                        survey=survey, user_id__in=batch
+                    ).values_list("user_id", "pk")
+                )
+                for user_survey in user_surveys:
+                    user_survey.pk = pks[user_survey.user_id]
+
+            # The same rows as UserSurvey.get_survey_responses
+            rows = [
+                (user_survey.pk.id, questions[result.step_id].id, str(result.answer))
+                for user_survey in user_surveys
+                if user_survey.result
+                for result in user_survey.pretty_results()
+                if result.step_id in questions
+            ]
+            self.insert_responses(rows)
+            responses += len(rows)
+        return responses
+
+    def insert_responses(self, rows):
+        """
+        Insert (usersurvey_id, question_id, response) rows. Building and
+        saving a million Response instances, with their hashid primary and
+        foreign keys, takes several times longer than the insert itself.
+        """
+        meta = Response._meta
+        quote = connection.ops.quote_name
+        columns = ", ".join(
+            quote(meta.get_field(name).column)
+            for name in ("usersurvey", "question", "response")
+        )
+        sql = f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s)"  # noqa: S608
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+
+    def get_result(self, survey, steps):
+        """A SurveyKit task result, in the shape UserSurvey.pretty_results reads."""
+        start = STARTED + timedelta(minutes=self.rng.randrange(365 * 24 * 60))
+        end = start
+        results = []
+        for step in steps:
+            dates = {"startDate": iso(end)}
+            end += timedelta(seconds=self.rng.randint(2, 60))
+            dates["endDate"] = iso(end)
+            step_results = []
+            if "answerFormat" in step:
+                step_results.append(
+                    {
+                        "id": step["stepIdentifier"],
+                        **dates,
+                        "result": self.get_answer(step["answerFormat"]),
+                    }
+                )
+            results.append(
+                {"id": step["stepIdentifier"], **dates, "results": step_results}
+            )
+        return {
+            "id": {"id": str(survey.pk)},
+            "startDate": iso(start),
+            "endDate": iso(end),
+            "finishReason": "COMPLETED",
+            "results": results,
+        }
+
+    def get_answer(self, answer_format):
+        answer_type = answer_format["type"]
+        if answer_type == "integer":
+            return self.rng.randint(
+                int(answer_format["minimumValue"]), int(answer_format["maximumValue"])
+            )
+        if answer_type == "date":
+            low, high = (
+                datetime.fromisoformat(answer_format[key])
+                for key in ("minDate", "maxDate")
+            )
+            days = self.rng.randint(0, (high - low).days)
+            return iso(low + timedelta(days=days))
+        if answer_type == "single":
+            return self.rng.choice(answer_format["textChoices"])
+        if answer_type == "multiple":
+            choices = answer_format["textChoices"]
+            return self.rng.sample(choices, self.rng.randint(1, len(choices)))
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(1, 12)))
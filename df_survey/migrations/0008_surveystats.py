@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_survey_stats(apps, schema_editor):
+    Survey = apps.get_model("df_survey", "Survey")
+    SurveyStats = apps.get_model("df_survey", "SurveyStats")
+    UserSurvey = apps.get_model("df_survey", "UserSurvey")
+
+    counts = {
+        row["survey"]: row
+        for row in UserSurvey.objects.values("survey")
+        .annotate(
+            users_total=Count("pk"),
+            users_completed=Count("pk", filter=Q(result__isnull=False)),
+        )
+        .order_by()
+    }
+    SurveyStats.objects.bulk_create(
+        [
+            SurveyStats(
+                survey_id=survey_id,
+                users_total=counts.get(survey_id, {}).get("users_total", 0),
+                users_completed=counts.get(survey_id, {}).get("users_completed", 0),
+            )
+            for survey_id in Survey.objects.values_list("pk", flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("df_survey", "0007_alter_question_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SurveyStats",
+            fields=[
+                (
+                    "survey",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="df_survey.survey",
+                    ),
+                ),
+                ("users_total", models.IntegerField(default=0)),
+                ("users_completed", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Survey stats",
+            },
+        ),
+        migrations.RunPython(populate_survey_stats, migrations.RunPython.noop),
+    ]
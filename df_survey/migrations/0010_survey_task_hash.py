@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+from df_survey.utils import json_digest
+
+
+def populate_task_hash(apps, schema_editor):
+    Survey = apps.get_model("df_survey", "Survey")
+    surveys = list(Survey.objects.only("pk", "task"))
+    for survey in surveys:
+        survey.task_hash = json_digest(survey.task)
+    Survey.objects.bulk_update(surveys, ["task_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("df_survey", "0009_assignmentjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="survey",
+            name="task_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Content hash of the task, updated on save",
+                max_length=64,
+            ),
+        ),
+        migrations.RunPython(populate_task_hash, migrations.RunPython.noop),
+    ]
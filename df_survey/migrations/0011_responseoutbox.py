@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+import django.utils.timezone
+import hashid_field.field
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("df_survey", "0010_survey_task_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResponseOutbox",
+            fields=[
+                (
+                    "id",
+                    hashid_field.field.BigHashidAutoField(
+                        alphabet="ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890",
+                        auto_created=True,
+                        min_length=13,
+                        prefix="",
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "available_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                (
+                    "usersurvey",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="df_survey.usersurvey",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Response outbox",
+            },
+        ),
+    ]
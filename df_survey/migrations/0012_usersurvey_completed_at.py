@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_completed_at(apps, schema_editor):
+    # The API used to report the last modification of a result as completion
+    UserSurvey = apps.get_model("df_survey", "UserSurvey")
+    UserSurvey.objects.filter(result__isnull=False).update(
+        completed_at=models.F("modified")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("df_survey", "0011_responseoutbox"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usersurvey",
+            name="completed_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Set when a result is saved",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(populate_completed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="usersurvey",
+            index=models.Index(
+                fields=["survey", "completed_at"], name="usersurvey_survey_completed"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersurvey",
+            index=models.Index(
+                fields=["user", "completed_at"], name="usersurvey_user_completed"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("df_survey", "0012_usersurvey_completed_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="assignmentjob",
+            index=models.Index(
+                fields=["status", "created"], name="assignmentjob_status_created"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["survey", "sequence"], name="question_survey_sequence"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersurvey",
+            index=models.Index(
+                fields=["user", "modified"], name="usersurvey_user_modified"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersurvey",
+            index=models.Index(
+                condition=models.Q(("completed_at__isnull", True)),
+                fields=["modified"],
+                name="usersurvey_pending_modified",
+            ),
+        ),
+    ]
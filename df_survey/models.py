@@ -1,7 +1,13 @@
 # 1. There is no point prepending Survey to every model as this is the app name
 # 2. Quite a few anti-patterns spotted
 
+import logging
+import threading
+from collections import defaultdict
 from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import partial
+from math import ceil
 from typing import TYPE_CHECKING, Any
 
 from df_notifications.decorators import (
@@ -14,22 +20,101 @@ from df_notifications.models import (
     NotificationModelAsyncRule,
 )
 from django.contrib.auth import get_user_model
-from django.core import exceptions
-from django.db import models
-from django.db.models import F, OuterRef, QuerySet, Subquery, Value
-from django.db.models.functions import Coalesce, Round
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, transaction
+from django.db.models import (
+    Case,
+    F,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Substr
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
+from django.utils.timezone import now
 from model_utils.models import TimeStampedModel
 
 from df_survey.renderers import SurveyKitRenderer
+from df_survey.settings import api_settings
+from df_survey.utils import (
+    VersionedCache,
+    batched,
+    iter_unique_pks,
+    json_digest,
+)
+from df_survey.validators import validate_task_json
 
 if TYPE_CHECKING:
     from django.contrib.auth.models import User
 else:
     User = get_user_model()
 
+RESPONSES_CHUNK_SIZE = 2000
+ASSIGN_BATCH_SIZE = 1000
+ASSIGNMENT_JOB_STALE_AFTER = timedelta(minutes=10)
+RESPONSE_OUTBOX_RETRY_DELAY = 30
+HISTOGRAM_BUCKETS = 10
+
+# Answers of integer and date questions that can be cast in SQL. Dates must
+# exist, PostgreSQL aborts the whole query on a cast of "2023-02-29"
+INTEGER_RESPONSE_REGEX = r"^-?[0-9]{1,9}$"
+DATE_RESPONSE_REGEX = (
+    r"^([1-9][0-9]{3}-("
+    r"(0[13578]|1[02])-(0[1-9]|[12][0-9]|3[01])"
+    r"|(0[469]|11)-(0[1-9]|[12][0-9]|30)"
+    r"|02-(0[1-9]|1[0-9]|2[0-8]))"
+    # February 29th of the leap years
+    r"|([1-9][0-9](0[48]|[2468][048]|[13579][26])|([2468][048]|[13579][26])00)"
+    r"-02-29)"
+)
+EPOCH = date(1970, 1, 1)
+
+
+logger = logging.getLogger(__name__)
+
+step_index_cache = VersionedCache(lambda: api_settings.STEP_INDEX_CACHE_SIZE)
+
+# Surveys whose task is regenerated on the next commit, per thread and database
+scheduled_task_rebuilds = threading.local()
+
+# SurveyStats state of the UserSurveys being deleted, per thread and database
+pending_stats_deletes = threading.local()
+
+
+class AlreadySubmitted(Exception):
+    pass
+
+
+@dataclass
+class ResultEntry:
+    __slots__ = ("step_id", "question", "answer", "answer_full")
+
+    step_id: str
+    question: str
+    answer: str
+    answer_full: Any
+
+
+@dataclass
+class ResponseAnalytics:
+    """
+    Distribution of the answers to an integer or date question. ``median`` is
+    interpolated within its bucket, ``histogram`` holds a ``(first, last,
+    count)`` tuple per bucket.
+    """
+
+    count: int
+    min: Any
+    max: Any
+    mean: Any
+    median: Any
+    histogram: list
+
 
 class Category(models.Model):
     slug = models.CharField(max_length=128)
@@ -41,64 +126,40 @@ class Category(models.Model):
         verbose_name_plural = "Survey categories"
 
 
-def validate_task_json(json):
-    # 1. Ensure all target steps are present in rules
-    step_identifiers = [step["stepIdentifier"]["id"] for step in json["steps"]]
-
-    errors = []
-    if "rules" in json:
-        line = 0
-        for rule in json["rules"]:
-            if rule["type"] == "conditional":
-                step_id = rule["triggerStepIdentifier"]["id"]
-                if step_id not in step_identifiers:
-                    print("VVVs")
-
-                    errors.append(
-                        {
-                            "task": f"Invalid triggerStepIdentifier '{step_id}' in rule '{line}'"
-                        }
-                    )
-                for k, v in rule["values"].items():
-                    if v not in step_identifiers:
-                        errors.append(
-                            {
-                                "task": [
-                                    f"Invalid target step '{v}' in value '{k}' of rule '{line}'"
-                                ]
-                            }
-                        )
-            line += 1
-        if errors:
-            raise exceptions.ValidationError(errors)
-
-
 class SurveyQuerySet(models.QuerySet):
     def annotate_stats(self):
         return self.annotate(
-            users_completed=Coalesce(
-                Subquery(
-                    UserSurvey.objects.filter(
-                        survey=OuterRef("pk"), result__isnull=False
-                    )
-                    .values("survey")
-                    .annotate(total=models.Count("pk"))
-                    .values("total"),
-                    output_field=models.IntegerField(),
-                ),
-                Value(0),
-            ),
-            users_total=Coalesce(
-                Subquery(
-                    UserSurvey.objects.filter(survey=OuterRef("pk"))
-                    .values("survey")
-                    .annotate(total=models.Count("pk"))
-                    .values("total"),
-                    output_field=models.IntegerField(),
-                ),
-                Value(0),
-            ),
+            users_completed=Coalesce(F("stats__users_completed"), Value(0)),
+            users_total=Coalesce(F("stats__users_total"), Value(0)),
+        )
+
+    def generate_tasks(self, batch_size=1000, fail_silently=False):
+        """
+        Regenerate the tasks of the surveys from their questions, read with a
+        single prefetch, and save the tasks that changed with ``bulk_update``.
+        Returns the number of updated surveys.
+
+        With ``fail_silently``, the surveys whose task cannot be generated are
+        logged and keep their current task.
+        """
+        changed = []
+        for survey in self.prefetch_related("question_set"):
+            try:
+                survey.generate_task()
+            except Exception:
+                if not fail_silently:
+                    raise
+                logger.exception("Cannot generate the task of survey %s", survey.pk)
+                continue
+            task_hash = json_digest(survey.task)
+            if task_hash != survey.task_hash:
+                # bulk_update skips Survey.save()
+                survey.task_hash = task_hash
+                changed.append(survey)
+        Survey.objects.db_manager(self.db).bulk_update(
+            changed, ["task", "task_hash"], batch_size=batch_size
         )
+        return len(changed)
 
 
 class Survey(models.Model):
@@ -113,6 +174,55 @@ class Survey(models.Model):
         Category, on_delete=models.SET_NULL, null=True, blank=True
     )
     task = models.JSONField(validators=[validate_task_json], null=True, blank=True)
+    task_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="Content hash of the task, updated on save",
+    )
+
+    def save(self, *args, **kwargs):
+        self.task_hash = json_digest(self.task)
+        self._task_digest = self.task, self.task_hash
+        if (
+            kwargs.get("update_fields") is not None
+            and "task" in kwargs["update_fields"]
+        ):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "task_hash"}
+        adding = self._state.adding
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            if adding:
+                # SurveyStats.objects.add() only has to increment it
+                SurveyStats.objects.db_manager(self._state.db).bulk_create(
+                    [SurveyStats(survey=self)], ignore_conflicts=True
+                )
+
+    def get_task_digest(self):
+        """
+        Content hash of ``task``, computed once per task object of this
+        instance. Assign or save the task after changing it in place.
+        """
+        # task_hash can't be trusted: update() leaves it stale
+        task, digest = getattr(self, "_task_digest", (None, None))
+        if task is not self.task or digest is None:
+            digest = json_digest(self.task)
+            self._task_digest = self.task, digest
+        return digest
+
+    def get_step_titles(self):
+        """
+        Map of step identifier to title of the task steps, shared between
+        callers and cached by task content. Do not modify it.
+        """
+        return step_index_cache.get(
+            self.pk,
+            self.get_task_digest(),
+            lambda: {
+                step["stepIdentifier"]["id"]: step["title"]
+                for step in self.task["steps"]
+            },
+        )
 
     def generate_task(self):
         self.task = SurveyKitRenderer.generate_task_from_survey(self)
@@ -132,13 +242,16 @@ class Survey(models.Model):
 
     def get_responses(self):
         users = self.get_respondents()
-        return self.question_set.all().annotate_responses(users)
+        return self.question_set.all().with_responses(users)
 
     def get_responses_stats(self):
         return self.question_set.all().annotate_responses_stats()
 
+    def get_responses_analytics(self):
+        return self.question_set.all().annotate_responses_analytics()
+
     def get_responses_tuple(self):
-        users = self.get_respondents()
+        users = list(self.get_respondents())
         qs = self.question_set.all().responses_value_list(users)
 
         return users, qs
@@ -147,17 +260,212 @@ class Survey(models.Model):
         return f"{self.id}: {self.title}"
 
 
-class UserSurveyManager(models.Manager):
+class SurveyStatsQuerySet(models.QuerySet):
+    def add(self, survey_id, users_total=0, users_completed=0):
+        if not (users_total or users_completed):
+            return
+        updated = self.filter(survey_id=survey_id).update(
+            users_total=F("users_total") + users_total,
+            users_completed=F("users_completed") + users_completed,
+        )
+        # Surveys get their row on creation, except bulk created ones. Only
+        # increments create it, decrements also happen while the survey itself
+        # is being deleted. Concurrent first increments both insert an empty
+        # row, one is ignored, and both add to it: writing counts read in
+        # each transaction (rebuild) would lose one of them.
+        if not updated and users_total >= 0 and users_completed >= 0:
+            self.bulk_create([SurveyStats(survey_id=survey_id)], ignore_conflicts=True)
+            self.filter(survey_id=survey_id).update(
+                users_total=F("users_total") + users_total,
+                users_completed=F("users_completed") + users_completed,
+            )
+
+    def rebuild(self, surveys=None, batch_size=1000):
+        if surveys is None:
+            surveys = Survey.objects.all()
+
+        counts = {
+            row["survey"]: row
+            for row in UserSurvey.objects.filter(survey__in=surveys.values("pk"))
+            .values("survey")
+            .annotate(
+                users_total=models.Count("pk"),
+                users_completed=models.Count(
+                    "pk", filter=Q(completed_at__isnull=False)
+                ),
+            )
+            .order_by()
+        }
+        stats = [
+            SurveyStats(
+                survey_id=survey_id,
+                users_total=counts.get(survey_id, {}).get("users_total", 0),
+                users_completed=counts.get(survey_id, {}).get("users_completed", 0),
+            )
+            for survey_id in surveys.values_list("pk", flat=True)
+        ]
+        self.bulk_create(
+            stats,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["survey"],
+            update_fields=["users_total", "users_completed"],
+        )
+        return len(stats)
+
+
+class SurveyStats(models.Model):
+    """
+    Denormalized UserSurvey counters, kept up to date on every UserSurvey
+    save and delete. Use the ``rebuild_survey_stats`` command after bulk
+    changes that bypass them (e.g. ``QuerySet.update``).
+    """
+
+    objects = SurveyStatsQuerySet.as_manager()
+
+    survey = models.OneToOneField(
+        Survey, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    users_total = models.IntegerField(default=0)
+    users_completed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.survey_id}: {self.users_completed}/{self.users_total}"
+
+    class Meta:
+        verbose_name_plural = "Survey stats"
+
+
+class UserSurveyQuerySet(models.QuerySet):
+    def values_for_list(self):
+        """
+        Dicts with the fields of the user survey list, without the task and
+        result JSON columns.
+        """
+        return self.values(
+            "pk",
+            "created",
+            "modified",
+            title=F("survey__title"),
+            category=F("survey__category__slug"),
+            description=F("survey__description"),
+            completed=F("completed_at"),
+        )
+
+
+class UserSurveyManager(models.Manager.from_queryset(UserSurveyQuerySet)):
     def get_queryset(self):
         return super().get_queryset().select_related("survey__category")
 
+    def get_or_assign(self, user, survey_id):
+        """
+        The user survey of ``user`` for ``survey_id``, assigned on first
+        access. Assigning doesn't send notifications.
+
+        Concurrent first accesses race on the ``user``/``survey`` unique
+        constraint: the insert that loses reads the winning row once
+        instead of retrying.
+        """
+        try:
+            return self.get(user=user, survey_id=survey_id)
+        except self.model.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                # bulk_create sends no post_save, so no notification either
+                self.bulk_create([self.model(user=user, survey_id=survey_id)])
+                SurveyStats.objects.add(survey_id, users_total=1)
+        except IntegrityError:
+            pass
+        return self.get(user=user, survey_id=survey_id)
+
     def create_for_users(self, survey=None, users=None):
         if survey:
-            users = users or User.objects.filter(is_active=True).exclude(
-                id__in=self.filter(survey=survey).values("user_id")
+            if users is None:
+                users = User.objects.filter(is_active=True).exclude(
+                    id__in=self.filter(survey=survey).values("user_id")
+                )
+            return self.bulk_assign(survey, users)
+        return []
+
+    def parse_survey_responses(self, user_surveys, batch_size=RESPONSES_CHUNK_SIZE):
+        """
+        Parse the results of ``user_surveys`` into Response rows, upserting
+        them in batches across all the user surveys. Returns the number of
+        parsed user surveys.
+        """
+        question_ids = {}
+        surveys = {}
+        responses = []
+        parsed = 0
+        for user_survey in user_surveys.filter(completed_at__isnull=False).iterator(
+            chunk_size=batch_size
+        ):
+            # Each row brings its own copy of the survey, share one so that its
+            # task digest is computed once
+            user_survey.survey = surveys.setdefault(
+                user_survey.survey_id, user_survey.survey
+            )
+            if user_survey.survey_id not in question_ids:
+                question_ids[user_survey.survey_id] = set(
+                    Question.objects.filter(
+                        survey_id=user_survey.survey_id
+                    ).values_list("id", flat=True)
+                )
+            responses += user_survey.get_survey_responses(
+                question_ids[user_survey.survey_id]
             )
-            for user in users:
-                self.get_or_create(user=user, survey=survey)
+            parsed += 1
+            if len(responses) >= batch_size:
+                Response.objects.upsert(responses, batch_size=batch_size)
+                responses = []
+        Response.objects.upsert(responses, batch_size=batch_size)
+        return parsed
+
+    def bulk_assign(self, survey, users, batch_size=ASSIGN_BATCH_SIZE, notify=True):
+        """
+        Assign ``survey`` to ``users`` (a queryset or an iterable of users or
+        user ids) in batches, skipping users that already have it.
+
+        Rows are inserted with ``bulk_create(ignore_conflicts=True)`` relying on
+        the ``user``/``survey`` unique constraint. Returns the rows created by
+        this call and, unless ``notify`` is False, invokes the
+        UserSurveyNotification rules for each of them as ``post_save`` would.
+        """
+        created = []
+        for user_ids in batched(iter_unique_pks(users), batch_size):
+            with transaction.atomic():
+                existing = set(
+                    self.filter(survey=survey, user_id__in=user_ids).values_list(
+                        "user_id", flat=True
+                    )
+                )
+                new_ids = [pk for pk in user_ids if pk not in existing]
+                # The rows of this batch share their creation time, rows that a
+                # concurrent get_or_assign() or job inserted in the meantime
+                # were created at another time and are not counted again
+                created_at = now()
+                self.bulk_create(
+                    [
+                        self.model(user_id=pk, survey=survey, created=created_at)
+                        for pk in new_ids
+                    ],
+                    ignore_conflicts=True,
+                )
+                batch = list(
+                    self.filter(
+                        survey=survey, user_id__in=new_ids, created=created_at
+                    ).select_related("user")
+                )
+                SurveyStats.objects.add(survey.pk, users_total=len(batch))
+            created.extend(batch)
+
+        if notify and created:
+            rules = list(UserSurveyNotification.objects.all())
+            for user_survey in created:
+                user_survey._notification_rules = rules
+                UserSurveyNotification.invoke(user_survey)
+        return created
 
 
 class UserSurvey(TimeStampedModel, NotifiableModelMixin):
@@ -165,22 +473,71 @@ class UserSurvey(TimeStampedModel, NotifiableModelMixin):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     survey = models.ForeignKey(Survey, on_delete=models.CASCADE)
     result = models.JSONField(null=True, blank=True)
+    completed_at = models.DateTimeField(
+        null=True, blank=True, editable=False, help_text="Set when a result is saved"
+    )
     objects = UserSurveyManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stats_state = instance.get_stats_state()
+        return instance
+
+    def get_stats_state(self):
+        # (survey, completed) as counted in SurveyStats, None if unknown
+        if "completed_at" not in self.__dict__:
+            return None
+        return self.survey_id, self.completed_at is not None
+
+    def get_saved_stats_state(self):
+        state = getattr(self, "_stats_state", None)
+        if state is None:
+            row = (
+                UserSurvey.objects.filter(pk=self.pk)
+                .values_list("survey_id", "completed_at")
+                .first()
+            )
+            if row is not None:
+                state = row[0], row[1] is not None
+        return state
+
+    def set_completed_at(self):
+        if "result" not in self.__dict__:
+            return
+        if self.result is None:
+            self.completed_at = None
+        elif self.completed_at is None:
+            self.completed_at = now()
+
+    def submit(self, result):
+        """
+        Save ``result`` as the submission of this user survey, or raise
+        AlreadySubmitted if it was submitted before.
+
+        The survey is claimed with a single ``UPDATE ... WHERE completed_at
+        IS NULL``, so of concurrent submissions exactly one updates the row
+        and the others raise. The result is saved in the same transaction.
+        """
+        with transaction.atomic():
+            completed_at = now()
+            claimed = UserSurvey.objects.filter(
+                pk=self.pk, completed_at__isnull=True
+            ).update(completed_at=completed_at)
+            if not claimed:
+                raise AlreadySubmitted(f"{self} has already been submitted")
+
+            # Counted as pending in SurveyStats until the claim
+            self._stats_state = self.survey_id, False
+            self.result = result
+            self.completed_at = completed_at
+            self.save()
+
     # TODO: move to SurveyKit renderer and rename to parse_results
     def pretty_results(self):
-        @dataclass
-        class ResultEntry:
-            step_id: str
-            question: str
-            answer: str
-            answer_full: Any
-
         results = []
         if self.result:
-            questions = {
-                q["stepIdentifier"]["id"]: q["title"] for q in self.survey.task["steps"]
-            }
+            questions = self.survey.get_step_titles()
 
             for result in self.result["results"]:
                 try:
@@ -221,19 +578,60 @@ class UserSurvey(TimeStampedModel, NotifiableModelMixin):
     def save(self, *args, **kwargs):
         if self.result is not None:
             self.to_digest = True
-        super().save(*args, **kwargs)
+        self.set_completed_at()
+        if (
+            kwargs.get("update_fields") is not None
+            and "result" in kwargs["update_fields"]
+        ):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "completed_at"}
 
-    def parse_survey_response(self):
-        questions = {q.id: q for q in self.survey.question_set.all()}
+        old_state = None if self._state.adding else self.get_saved_stats_state()
+        new_state = self.get_stats_state() or (
+            self.survey_id,
+            bool(old_state and old_state[1]),
+        )
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_state is not None and old_state[0] == new_state[0]:
+                if old_state[1] != new_state[1]:
+                    SurveyStats.objects.add(
+                        new_state[0], users_completed=new_state[1] - old_state[1]
+                    )
+            else:
+                if old_state is not None:
+                    SurveyStats.objects.add(
+                        old_state[0], users_total=-1, users_completed=-old_state[1]
+                    )
+                SurveyStats.objects.add(
+                    new_state[0], users_total=1, users_completed=new_state[1]
+                )
+        self._stats_state = new_state
+
+    def get_survey_responses(self, question_ids=None):
+        """
+        Unsaved Response rows for the answers of this result, one per
+        question of the survey.
+        """
+        if question_ids is None:
+            question_ids = set(self.survey.question_set.values_list("id", flat=True))
+
+        responses = {}
         for result in self.pretty_results():
-            if result.step_id in questions:
-                Response.objects.update_or_create(
+            if result.step_id in question_ids:
+                responses[result.step_id] = Response(
                     usersurvey=self,
-                    question=questions[result.step_id],
-                    defaults={
-                        "response": result.answer,
-                    },
+                    question_id=result.step_id,
+                    response=result.answer,
                 )
+        return list(responses.values())
+
+    def parse_survey_response(self):
+        Response.objects.upsert(self.get_survey_responses())
+
+    def parse_survey_response_once(self):
+        if self.result and not self.response_set.exists():
+            self.parse_survey_response()
 
     def __str__(self):
         return f"{self.user} - {self.survey}"
@@ -241,6 +639,120 @@ class UserSurvey(TimeStampedModel, NotifiableModelMixin):
     class Meta:
         ordering = ["-modified"]
         unique_together = ["user", "survey"]
+        indexes = [
+            models.Index(
+                fields=["survey", "completed_at"], name="usersurvey_survey_completed"
+            ),
+            models.Index(
+                fields=["user", "completed_at"], name="usersurvey_user_completed"
+            ),
+            # API list, newest first
+            models.Index(fields=["user", "modified"], name="usersurvey_user_modified"),
+            # Reminders sweep the pending user surveys by last modification
+            models.Index(
+                fields=["modified"],
+                condition=Q(completed_at__isnull=True),
+                name="usersurvey_pending_modified",
+            ),
+        ]
+
+
+class EpochDays(models.Func):
+    """Days from 1970-01-01 to an ISO 8601 date string."""
+
+    output_field = models.IntegerField()
+    template = "(CAST(%(expressions)s AS date) - DATE '1970-01-01')"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST(julianday(%(expressions)s) - 2440587.5 AS integer)",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        # Subtracting dates gives the difference of their YYYYMMDD numbers
+        return self.as_sql(
+            compiler,
+            connection,
+            template="DATEDIFF(CAST(%(expressions)s AS date), '1970-01-01')",
+            **extra_context,
+        )
+
+
+def get_declared_range(question):
+    """The ``min..max`` range of the question format as numbers, None if unset."""
+    try:
+        question_format = SurveyKitRenderer.parse_format(question.format)
+        bounds = [question_format["min"], question_format["max"]]
+        if question.type == Question.Type.date:
+            bounds = [(date.fromisoformat(str(b)[:10]) - EPOCH).days for b in bounds]
+        low, high = sorted(int(bound) for bound in bounds)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return low, high
+
+
+def to_answer(question_type, value):
+    if question_type == Question.Type.date:
+        return EPOCH + timedelta(days=round(value))
+    return round(value, 2)
+
+
+def build_response_analytics(question_type, grid, buckets):
+    """
+    ResponseAnalytics of a question from the ``(count, min, max, sum)`` of its
+    non-empty ``buckets`` by index, on the ``(low, high, width)`` grid.
+    """
+    count = sum(bucket[0] for bucket in buckets.values())
+    half = count / 2
+    seen = 0
+    for index in sorted(buckets):
+        bucket_count, bucket_min, bucket_max, _ = buckets[index]
+        if seen + bucket_count >= half:
+            # Assume the answers are spread evenly within the bucket
+            median = bucket_min + (bucket_max - bucket_min) * (
+                (half - seen) / bucket_count
+            )
+            break
+        seen += bucket_count
+
+    low, high, width = grid
+    return ResponseAnalytics(
+        count=count,
+        min=to_answer(question_type, min(bucket[1] for bucket in buckets.values())),
+        max=to_answer(question_type, max(bucket[2] for bucket in buckets.values())),
+        mean=to_answer(
+            question_type, sum(bucket[3] for bucket in buckets.values()) / count
+        ),
+        median=to_answer(question_type, median),
+        histogram=[
+            (
+                to_answer(question_type, low + index * width),
+                to_answer(question_type, min(low + (index + 1) * width - 1, high)),
+                buckets.get(index, (0,))[0],
+            )
+            for index in range((high - low) // width + 1)
+        ],
+    )
+
+
+def get_response_stat_attributes(responses):
+    """
+    ``{attribute: response}`` for the stats of the sorted ``responses``, the
+    last response wins a shared attribute. Attributes are the response slugs,
+    prefixed with ``response-`` when they would shadow a Question attribute.
+    """
+    attributes = {}
+    for response in responses:
+        if response_slug := slugify(response):
+            if hasattr(Question, response_slug) or hasattr(
+                Question, f"{response_slug}_p"
+            ):
+                response_slug = f"response-{response_slug}"
+            attributes[response_slug] = response
+    return attributes
 
 
 class QuestionQuerySet(models.QuerySet):
@@ -261,36 +773,137 @@ class QuestionQuerySet(models.QuerySet):
         )
 
     def annotate_responses_stats(self):
-        query = self
-        for response in self.get_responses():
-            if response_slug := slugify(response):
-                query = query.annotate(
-                    **{
-                        response_slug: Subquery(
-                            Response.objects.filter(
-                                question_id=OuterRef("pk"),
-                                response=response,
-                            )
-                            .values("question")
-                            .annotate(total=models.Count("pk"))
-                            .values("total"),
-                            output_field=models.IntegerField(),
-                        ),
-                        f"{response_slug}_p": Round(
-                            F(response_slug)
-                            * Value(100.0)
-                            / Subquery(
-                                Response.objects.filter(question_id=OuterRef("pk"))
-                                .values("question")
-                                .annotate(total=models.Count("pk"))
-                                .values("total"),
-                                output_field=models.IntegerField(),
-                            ),
-                            precision=1,
+        """
+        Return the questions with the count and percentage of every distinct
+        response set as ``<attribute>`` and ``<attribute>_p``, with the
+        attributes of get_response_stat_attributes().
+
+        All counts come from a single ``GROUP BY question, response`` query and
+        are reshaped in Python, so the SQL does not grow with the number of
+        distinct responses.
+        """
+        counts = {}
+        totals = defaultdict(int)
+        for question_id, response, count in (
+            Response.objects.filter(question__in=self.values("pk"))
+            .values_list("question_id", "response")
+            .annotate(total=models.Count("pk"))
+            # The database order of get_responses(), which names the columns
+            # of QuestionResponseStatResource: the collation decides which
+            # response wins a shared slug
+            .order_by("response")
+        ):
+            counts[question_id, response] = count
+            totals[question_id] += count
+
+        attributes = get_response_stat_attributes(
+            dict.fromkeys(response for _, response in counts)
+        )
+
+        questions = list(self)
+        for question in questions:
+            for attribute, response in attributes.items():
+                count = counts.get((question.pk, response))
+                setattr(question, attribute, count)
+                setattr(
+                    question,
+                    f"{attribute}_p",
+                    round(count * 100.0 / totals[question.pk], 1) if count else None,
+                )
+        return questions
+
+    def annotate_responses_analytics(self, buckets=HISTOGRAM_BUCKETS):
+        """
+        Return the integer and date questions with the ResponseAnalytics of
+        their answers set as ``analytics``, None without answers.
+
+        Answers are cast in SQL, skipping those that cannot be, and counted
+        by a single ``GROUP BY question, bucket`` query into at most
+        ``buckets`` buckets of the same width. The buckets span the
+        ``min..max`` range of the question format, answers outside of it
+        being counted in the first or last bucket. Questions without a range
+        use the range of their answers, which costs one more query.
+        """
+        questions = list(
+            self.filter(type__in=[Question.Type.integer, Question.Type.date])
+        )
+        date_ids = [q.pk for q in questions if q.type == Question.Type.date]
+        integer_ids = [q.pk for q in questions if q.type == Question.Type.integer]
+        responses = (
+            Response.objects.filter(
+                Q(question__in=integer_ids, response__regex=INTEGER_RESPONSE_REGEX)
+                | Q(question__in=date_ids, response__regex=DATE_RESPONSE_REGEX)
+            )
+            .annotate(
+                value=Case(
+                    When(
+                        question__in=date_ids,
+                        then=EpochDays(Substr("response", 1, 10)),
+                    ),
+                    default=Cast("response", models.IntegerField()),
+                )
+            )
+            .filter(value__isnull=False)
+        )
+
+        ranges = {question.pk: get_declared_range(question) for question in questions}
+        if missing := [pk for pk, bounds in ranges.items() if bounds is None]:
+            ranges.update(
+                (question_id, (low, high))
+                for question_id, low, high in responses.filter(question__in=missing)
+                .values("question_id")
+                .annotate(low=models.Min("value"), high=models.Max("value"))
+                .values_list("question_id", "low", "high")
+                .order_by()
+            )
+
+        grids = {}
+        for question_id, bounds in ranges.items():
+            if bounds is not None:
+                low, high = bounds
+                grids[question_id] = (
+                    low,
+                    high,
+                    max(1, ceil((high - low + 1) / buckets)),
+                )
+
+        counts = defaultdict(dict)
+        if grids:
+            bucket = Case(
+                *[
+                    When(
+                        question_id=question_id,
+                        then=Least(
+                            Greatest((F("value") - low) / width, Value(0)),
+                            Value((high - low) // width),
                         ),
-                    }
+                    )
+                    for question_id, (low, high, width) in grids.items()
+                ]
+            )
+            for question_id, index, *bucket_stats in (
+                responses.annotate(bucket=bucket)
+                .values("question_id", "bucket")
+                .annotate(
+                    count=models.Count("pk"),
+                    low=models.Min("value"),
+                    high=models.Max("value"),
+                    total=models.Sum("value"),
+                )
+                .values_list("question_id", "bucket", "count", "low", "high", "total")
+                .order_by()
+            ):
+                counts[question_id][index] = bucket_stats
+
+        for question in questions:
+            question.analytics = (
+                build_response_analytics(
+                    question.type, grids[question.pk], counts[question.pk]
                 )
-        return query
+                if counts[question.pk]
+                else None
+            )
+        return questions
 
     def get_responses(self):
         return [
@@ -303,8 +916,51 @@ class QuestionQuerySet(models.QuerySet):
             )
         ]
 
+    def pivot_responses(self, users, chunk_size=RESPONSES_CHUNK_SIZE):
+        """
+        Yield ``(question, answers)`` for every question, where ``answers``
+        holds the response of each of ``users`` (by email) or an empty string.
+
+        Responses are read once, ordered the same way as the questions, so only
+        a single row of the question/respondent matrix is kept in memory.
+        """
+        users = list(users)
+        columns = {user: index for index, user in enumerate(users)}
+        questions = self.order_by("sequence", "pk")
+        responses = (
+            Response.objects.filter(question__in=questions.values("pk"))
+            .order_by("question__sequence", "question_id", "usersurvey_id")
+            .values_list("question_id", "usersurvey__user__email", "response")
+            .iterator(chunk_size=chunk_size)
+        )
+
+        pending = next(responses, None)
+        for question in questions:
+            answers = [""] * len(users)
+            answered = set()
+            while pending is not None and pending[0] == question.pk:
+                _, user, response = pending
+                index = columns.get(user)
+                if index is not None and index not in answered:
+                    answers[index] = response
+                    answered.add(index)
+                pending = next(responses, None)
+            yield question, answers
+
+    def with_responses(self, users):
+        """
+        Yield questions with the response of each of ``users`` set as an
+        attribute named after the user's email.
+        """
+        users = list(users)
+        for question, answers in self.pivot_responses(users):
+            for user, answer in zip(users, answers):
+                setattr(question, user, answer)
+            yield question
+
     def responses_value_list(self, users):
-        return self.annotate_responses(users).values_list("question", *users)
+        for question, answers in self.pivot_responses(users):
+            yield (question.question, *answers)
 
 
 class Question(models.Model):
@@ -332,23 +988,224 @@ class Question(models.Model):
 
     class Meta:
         ordering = ["sequence"]
+        indexes = [
+            models.Index(
+                fields=["survey", "sequence"], name="question_survey_sequence"
+            ),
+        ]
+
+
+class ResponseQuerySet(models.QuerySet):
+    def upsert(self, responses, batch_size=RESPONSES_CHUNK_SIZE):
+        """Insert ``responses`` or update the existing answer to the question."""
+        return self.bulk_create(
+            responses,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["usersurvey", "question"],
+            update_fields=["response"],
+        )
 
 
 class Response(models.Model):
     # TODO csv exporter
+    objects = ResponseQuerySet.as_manager()
+
     usersurvey = models.ForeignKey(UserSurvey, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     response = models.TextField()
 
     class Meta:
+        # The unique index also serves the lookups by user survey, and the
+        # statistics use the question foreign key index: response is an
+        # unbounded TextField, too long for a B-tree index on PostgreSQL and
+        # not indexable without a prefix on MySQL
         unique_together = ["usersurvey", "question"]
 
 
+class ResponseOutboxQuerySet(models.QuerySet):
+    def enqueue(self, user_survey):
+        self.bulk_create(
+            [ResponseOutbox(usersurvey=user_survey)], ignore_conflicts=True
+        )
+
+    def process(self, batch_size=100, max_attempts=None):
+        """
+        Parse the responses of up to ``batch_size`` queued user surveys and
+        return how many entries were handled.
+
+        Entries are locked for the duration of the batch and deleted in the
+        same transaction as their responses are written; failed entries are
+        retried with exponential backoff up to ``max_attempts`` times.
+        """
+        if max_attempts is None:
+            max_attempts = api_settings.RESPONSE_OUTBOX_MAX_ATTEMPTS
+
+        with transaction.atomic():
+            entries = list(
+                # Only the entries: locking the joined user surveys and
+                # surveys would block their saves and the other workers
+                self.select_for_update(skip_locked=True, of=("self",))
+                .filter(attempts__lt=max_attempts, available_at__lte=now())
+                .select_related("usersurvey__survey")
+                .order_by("available_at")[:batch_size]
+            )
+            for entry in entries:
+                try:
+                    with transaction.atomic():
+                        entry.usersurvey.parse_survey_response_once()
+                        entry.delete()
+                except Exception as e:
+                    entry.attempts += 1
+                    entry.last_error = str(e)
+                    entry.available_at = now() + timedelta(
+                        seconds=RESPONSE_OUTBOX_RETRY_DELAY * 2**entry.attempts
+                    )
+                    entry.save()
+        return len(entries)
+
+
+class ResponseOutbox(models.Model):
+    """
+    User surveys whose result still has to be parsed into Response rows,
+    used when ``DF_SURVEY["DEFER_RESPONSE_PARSING"]`` is enabled.
+    """
+
+    objects = ResponseOutboxQuerySet.as_manager()
+
+    usersurvey = models.OneToOneField(
+        UserSurvey, on_delete=models.CASCADE, related_name="+"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return str(self.usersurvey_id)
+
+    class Meta:
+        verbose_name_plural = "Response outbox"
+
+
+class AssignmentJobQuerySet(models.QuerySet):
+    def claim(self, stale_after=ASSIGNMENT_JOB_STALE_AFTER):
+        """
+        Lock and return the oldest job a worker should process: a pending one,
+        or a running one whose worker stopped reporting progress.
+        """
+        with transaction.atomic():
+            job = (
+                self.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=AssignmentJob.Status.pending)
+                    | Q(
+                        status=AssignmentJob.Status.running,
+                        modified__lt=now() - stale_after,
+                    )
+                )
+                .order_by("created")
+                .first()
+            )
+            if job is not None:
+                job.status = AssignmentJob.Status.running
+                job.save()
+        return job
+
+
+class AssignmentJob(TimeStampedModel):
+    """
+    A queued assignment of a survey to many users, processed by the
+    ``run_assignment_jobs`` worker in keyset-ordered chunks.
+    """
+
+    class Status(models.TextChoices):
+        pending = "pending", "Pending"
+        running = "running", "Running"
+        completed = "completed", "Completed"
+        failed = "failed", "Failed"
+
+    objects = AssignmentJobQuerySet.as_manager()
+
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE)
+    all_users = models.BooleanField(
+        default=False, help_text="Assign to all active users"
+    )
+    users = models.ManyToManyField(User, blank=True, related_name="+")
+    groups = models.ManyToManyField(Group, blank=True, related_name="+")
+    status = models.CharField(
+        choices=Status.choices, max_length=16, default=Status.pending
+    )
+    users_total = models.PositiveIntegerField(null=True, blank=True)
+    users_assigned = models.PositiveIntegerField(default=0)
+    last_user_id = models.CharField(
+        max_length=255, blank=True, help_text="Keyset cursor of processed users"
+    )
+    error = models.TextField(blank=True)
+
+    def get_users(self):
+        if self.all_users:
+            return User.objects.filter(is_active=True)
+        return User.objects.filter(
+            Q(groups__in=self.groups.all()) | Q(id__in=self.users.all())
+        )
+
+    def run(self, batch_size=ASSIGN_BATCH_SIZE):
+        users = self.get_users().order_by("pk").values_list("pk", flat=True).distinct()
+        try:
+            if self.users_total is None:
+                self.users_total = users.count()
+                self.save()
+
+            while True:
+                if self.last_user_id:
+                    batch = list(users.filter(pk__gt=self.last_user_id)[:batch_size])
+                else:
+                    batch = list(users[:batch_size])
+                if not batch:
+                    break
+
+                # Progress is stored with the batch, so a restarted job
+                # continues right after the last committed user
+                with transaction.atomic():
+                    created = UserSurvey.objects.bulk_assign(self.survey, batch)
+                    self.users_assigned += len(created)
+                    self.last_user_id = str(batch[-1])
+                    self.save()
+        except Exception as e:
+            self.status = self.Status.failed
+            self.error = str(e)
+            self.save()
+            raise
+
+        self.status = self.Status.completed
+        self.save()
+
+    def __str__(self):
+        return f"{self.survey} - {self.status}"
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=["status", "created"], name="assignmentjob_status_created"
+            ),
+        ]
+
+
 @register_rule_model
 class UserSurveyNotification(NotificationModelAsyncRule):
     model = UserSurvey
     tracking_fields = []
 
+    @classmethod
+    def get_queryset(cls, instance: UserSurvey, prev):
+        # UserSurvey.objects.bulk_assign() reads the rules once for all its rows
+        rules = getattr(instance, "_notification_rules", None)
+        if rules is None:
+            return super().get_queryset(instance, prev)
+        return rules
+
     def get_users(self, instance: UserSurvey) -> list:
         return [instance.user]
 
@@ -358,7 +1215,7 @@ class UserSurveysReminder(NotificationModelAsyncReminder):
     model = UserSurvey
 
     def get_model_queryset(self) -> QuerySet[UserSurvey]:
-        return super().get_model_queryset().filter(result__isnull=True)
+        return super().get_model_queryset().filter(completed_at__isnull=True)
 
     def get_users(self, instance: UserSurvey) -> list:
         return [instance.user]
@@ -367,5 +1224,94 @@ class UserSurveysReminder(NotificationModelAsyncReminder):
 # TODO: This would make sense if we were doing rewrites
 @receiver(post_save, sender=UserSurvey)
 def parse_survey_response(sender, instance: UserSurvey, created, **kwargs):
-    if instance.result and not instance.response_set.exists():
-        instance.parse_survey_response()
+    if api_settings.DEFER_RESPONSE_PARSING:
+        # Runs inside UserSurvey.save() transaction, drained by process_response_outbox
+        if instance.result:
+            ResponseOutbox.objects.enqueue(instance)
+        return
+
+    instance.parse_survey_response_once()
+
+
+def is_survey_delete(origin):
+    # The SurveyStats rows of deleted surveys are deleted along with them
+    return isinstance(origin, Survey) or getattr(origin, "model", None) is Survey
+
+
+@receiver(pre_delete, sender=UserSurvey)
+def collect_survey_stats(sender, instance: UserSurvey, using, origin=None, **kwargs):
+    if is_survey_delete(origin):
+        return
+    pending = pending_stats_deletes.__dict__.get(using)
+    if pending is None or pending[0] is not origin:
+        pending = pending_stats_deletes.__dict__[using] = (origin, {})
+    pending[1][instance.pk] = instance.get_stats_state() or (instance.survey_id, False)
+
+
+@receiver(post_delete, sender=UserSurvey)
+def update_survey_stats(sender, instance: UserSurvey, using, origin=None, **kwargs):
+    """
+    Apply the decrements of a whole delete with the first post_delete signal.
+
+    Django sends pre_delete for every collected instance before deleting any
+    row, so by then ``collect_survey_stats`` has seen them all, and the
+    counters are updated with one query per survey instead of one per
+    UserSurvey, still in the transaction of the delete.
+    """
+    if is_survey_delete(origin):
+        return
+    pending_origin, states = pending_stats_deletes.__dict__.get(using, (None, {}))
+    if pending_origin is not origin or instance.pk not in states:
+        states = {
+            instance.pk: instance.get_stats_state() or (instance.survey_id, False)
+        }
+    elif states[instance.pk] is None:
+        # Counted with the first instance of this delete
+        return
+
+    deltas = defaultdict(lambda: [0, 0])
+    for pk, state in states.items():
+        if state is not None:
+            survey_id, completed = state
+            deltas[survey_id][0] -= 1
+            deltas[survey_id][1] -= completed
+            states[pk] = None
+    for survey_id, (users_total, users_completed) in deltas.items():
+        SurveyStats.objects.add(
+            survey_id, users_total=users_total, users_completed=users_completed
+        )
+
+
+def schedule_task_rebuild(survey_id, using=DEFAULT_DB_ALIAS):
+    """
+    Regenerate the task of ``survey_id`` once the current transaction
+    commits, right away outside of one.
+
+    Every survey scheduled before the commit is regenerated by the first
+    callback with a single ``generate_tasks()``, the later callbacks find
+    nothing left to do. Surveys scheduled in a rolled back transaction are
+    regenerated with the next commit, which is harmless. A survey whose task
+    cannot be generated is logged and does not stop the others.
+    """
+    survey_ids = scheduled_task_rebuilds.__dict__.setdefault(using, set())
+    survey_ids.add(survey_id)
+    # Robust: the transaction is already committed, a failed rebuild must not
+    # fail the request that scheduled it
+    transaction.on_commit(
+        partial(rebuild_scheduled_tasks, using), using=using, robust=True
+    )
+
+
+def rebuild_scheduled_tasks(using=DEFAULT_DB_ALIAS):
+    survey_ids = scheduled_task_rebuilds.__dict__.pop(using, None)
+    if survey_ids:
+        Survey.objects.using(using).filter(pk__in=survey_ids).generate_tasks(
+            fail_silently=True
+        )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def rebuild_survey_task(sender, instance: Question, using, **kwargs):
+    if api_settings.AUTO_GENERATE_TASKS:
+        schedule_task_rebuild(instance.survey_id, using)
@@ -1,8 +1,22 @@
 # This is temporary as we should use standard DRF renderers
 import json
 
+from django.template import Context, Template
 from rest_framework import exceptions
 
+from df_survey.settings import api_settings
+from df_survey.utils import VersionedCache, json_digest, text_digest
+from df_survey.validators import get_rule_targets, get_step_id
+
+TEMPLATE_TAG_STARTS = ("{{", "{%", "{#")
+
+
+def compile_task_template(task_json):
+    # Tasks without template syntax are cached as None and never rendered
+    if any(tag in task_json for tag in TEMPLATE_TAG_STARTS):
+        return Template(task_json)
+    return None
+
 
 class BaseRenderer:
     pass
@@ -51,6 +65,26 @@ class SurveyKitRenderer(BaseRenderer):
         },
     }
 
+    task_cache = VersionedCache(lambda: api_settings.TASK_TEMPLATE_CACHE_SIZE)
+    step_cache = VersionedCache(lambda: api_settings.STEP_CACHE_SIZE)
+
+    @classmethod
+    def render_task(cls, survey, context):
+        """
+        Return a fresh copy of ``survey.task`` rendered as a Django template
+        with ``context``.
+        """
+        task_json = json.dumps(survey.task)
+        # Keyed by the content in hand, task_hash is stale after an update()
+        template = cls.task_cache.get(
+            survey.pk,
+            text_digest(task_json),
+            lambda: compile_task_template(task_json),
+        )
+        if template is not None:
+            task_json = template.render(Context(context))
+        return json.loads(task_json)
+
     @classmethod
     def parse_format(self, fmt: str) -> dict:
         if fmt.startswith("{"):
@@ -66,42 +100,92 @@ class SurveyKitRenderer(BaseRenderer):
         return {}
 
     @classmethod
-    def generate_task_from_survey(cls, survey):
-        steps = []
-        for question in survey.question_set.all():
-            step = {
-                "type": "question",
-                "title": question.question,
-                "text": question.text,
-                "stepIdentifier": {"id": str(question.id)},
+    def get_step_hash(cls, question):
+        return json_digest(
+            [question.type, question.format, question.question, question.text]
+        )
+
+    @classmethod
+    def compile_step(cls, question):
+        step = {
+            "type": "question",
+            "title": question.question,
+            "text": question.text,
+            "stepIdentifier": {"id": str(question.id)},
+        }
+
+        if question.type == "info":
+            step_type, button_text = question.format.split("|")
+            step["type"] = step_type
+            step["buttonText"] = button_text
+        else:
+            try:
+                f = SurveyKitRenderer.FORMATS[question.type]
+            except KeyError:
+                raise exceptions.ValidationError(
+                    f"Unrecognized question type '{question.type}'"
+                )
+            question_format = cls.parse_format(question.format)
+            step["answerFormat"] = {
+                **f.get("defaults", {}),
+                **{
+                    k: question_format.get(v)
+                    for k, v in f.get("rewrites", {}).items()
+                    if v in question_format
+                },
             }
+        return step
+
+    @classmethod
+    def get_step_json(cls, question):
+        """
+        JSON text of the step of ``question``, compiled again only when the
+        fields it is built from change.
+        """
+        return cls.step_cache.get(
+            question.pk,
+            cls.get_step_hash(question),
+            lambda: json.dumps(cls.compile_step(question)),
+        )
 
-            if question.type == "info":
-                step_type, button_text = question.format.split("|")
-                step["type"] = step_type
-                step["buttonText"] = button_text
-            else:
-                try:
-                    f = SurveyKitRenderer.FORMATS[question.type]
-                except KeyError:
-                    raise exceptions.ValidationError(
-                        f"Unrecognized question type '{question.type}'"
-                    )
-                question_format = cls.parse_format(question.format)
-                step["answerFormat"] = {
-                    **f.get("defaults", {}),
-                    **{
-                        k: question_format.get(v)
-                        for k, v in f.get("rewrites", {}).items()
-                        if v in question_format
-                    },
-                }
-
-            steps.append(step)
+    @classmethod
+    def keep_rules(cls, task, steps):
+        """
+        Rules of the previous ``task`` that still apply to ``steps``. Rules of
+        removed steps and conditional values leading to them are dropped.
+        """
+        step_ids = {step["stepIdentifier"]["id"] for step in steps}
+        rules = []
+        for rule in (task or {}).get("rules") or []:
+            trigger = get_step_id({"stepIdentifier": rule.get("triggerStepIdentifier")})
+            if trigger not in step_ids:
+                continue
+            if rule.get("type") == "conditional" and isinstance(
+                rule.get("values"), dict
+            ):
+                values = rule["values"].items()
+                rule = {**rule, "values": {k: v for k, v in values if v in step_ids}}
+            elif any(target not in step_ids for target in get_rule_targets(rule) or []):
+                continue
+            rules.append(rule)
+        return rules
 
+    @classmethod
+    def generate_task_from_survey(cls, survey):
+        """
+        Task of the questions of ``survey``, keeping the rules of its current
+        task. Steps of unchanged questions are reused, and a single copy of
+        them is parsed so that the task can be modified freely.
+        """
+        steps = json.loads(
+            "[%s]"
+            % ",".join(
+                cls.get_step_json(question) for question in survey.question_set.all()
+            )
+        )
         return {
             "id": str(survey.id),
             "type": "navigable",
-            "rules": [],
+            "rules": cls.keep_rules(survey.task, steps),
             "steps": steps,
         }
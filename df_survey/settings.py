@@ -1,6 +1,21 @@
 from django.conf import settings
 from rest_framework.settings import APISettings
 
-DEFAULTS = {}
+DEFAULTS = {
+    "TASK_TEMPLATE_CACHE_SIZE": 256,
+    "STEP_INDEX_CACHE_SIZE": 256,
+    "STEP_CACHE_SIZE": 10000,
+    "TASK_VALIDATION_CACHE_SIZE": 256,
+    "DEFER_RESPONSE_PARSING": False,
+    "AUTO_GENERATE_TASKS": False,
+    "RESPONSE_OUTBOX_MAX_ATTEMPTS": 5,
+    "USER_SURVEY_PAGINATION_CLASS": None,
+    "USER_SURVEY_PAGE_SIZE": 100,
+    "USER_SURVEY_MAX_PAGE_SIZE": 1000,
+}
 
-api_settings = APISettings(getattr(settings, "DF_SURVEY", None), DEFAULTS)
+IMPORT_STRINGS = ("USER_SURVEY_PAGINATION_CLASS",)
+
+api_settings = APISettings(
+    getattr(settings, "DF_SURVEY", None), DEFAULTS, IMPORT_STRINGS
+)
@@ -0,0 +1,76 @@
+import csv
+import tempfile
+
+from django.db.models import QuerySet
+from django.http import Http404, StreamingHttpResponse
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover
+    Workbook = None
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_READ_SIZE = 64 * 1024
+
+
+class Echo:
+    """A file-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_xlsx(rows):
+    # A write-only workbook flushes rows to a temporary file as they are
+    # appended, so memory stays flat; the zip container is only complete once
+    # the workbook is saved, therefore the file is sent after all rows are read.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(XLSX_READ_SIZE):
+            yield chunk
+
+
+STREAMING_FORMATS = {
+    "csv": ("text/csv", iter_csv),
+}
+if Workbook is not None:
+    STREAMING_FORMATS["xlsx"] = (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iter_xlsx,
+    )
+
+
+def iter_export_rows(resource, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the header and every exported row of an import-export ``resource``
+    without building a ``tablib.Dataset``.
+    """
+    if isinstance(queryset, QuerySet):
+        queryset = queryset.iterator(chunk_size=chunk_size)
+
+    yield resource.get_export_headers()
+    for obj in queryset:
+        yield resource.export_resource(obj)
+
+
+def streaming_export_response(rows, file_format, filename):
+    try:
+        content_type, iter_format = STREAMING_FORMATS[file_format]
+    except KeyError:
+        raise Http404(f"Unsupported streaming export format '{file_format}'")
+
+    response = StreamingHttpResponse(iter_format(rows), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Maximum number of queries of the public entry points, checked by
+# tests/test_app/test_query_budgets.py against fixtures with more rows than any
+# budget, so that a query per row always fails. API and admin budgets include
+# the session and user lookups of the request.
+QUERY_BUDGETS = {
+    # API
+    # With the default limit/offset pagination, the ETag and the page both
+    # count the rows
+    "api.user_surveys.list": 6,
+    "api.user_surveys.list.not_modified": 4,
+    "api.user_surveys.retrieve": 5,
+    "api.user_surveys.retrieve.by_survey": 5,
+    "api.user_surveys.retrieve.by_survey.create": 10,
+    "api.user_surveys.update": 15,
+    # Admin
+    "admin.survey.changelist": 6,
+    "admin.survey.change": 8,
+    "admin.survey.export_question_responses": 7,
+    "admin.survey.export_question_responses_stat": 6,
+    "admin.survey.export_question_responses_analytics": 6,
+    "admin.survey.action.create_for_all_users": 6,
+    "admin.survey.action.generate_tasks": 7,
+    "admin.usersurvey.changelist": 6,
+    "admin.usersurvey.change": 7,
+    "admin.usersurvey.action.parse_survey_response": 7,
+    "admin.question.changelist": 5,
+    "admin.response.changelist": 5,
+    "admin.assignmentjob.changelist": 5,
+    "admin.responseoutbox.changelist": 5,
+    "admin.responseoutbox.action.retry": 5,
+    # Models
+    "Survey.get_respondents": 1,
+    "Survey.get_responses_tuple": 3,
+    "Survey.get_responses_stats": 2,
+    # Plus one for the range of the questions without a declared one
+    "Survey.get_responses_analytics": 3,
+    "Survey.get_step_titles": 1,
+    "Survey.generate_task": 1,
+    "UserSurvey.pretty_results": 1,
+    "UserSurvey.parse_survey_response": 2,
+    # Plus one per batch of changed surveys
+    "Survey.objects.generate_tasks": 3,
+    # Plus one per batch of rows
+    "QuestionResource.import_data": 14,
+    # Per batch of users
+    "UserSurvey.objects.bulk_assign": 11,
+    # Plus one per survey and per batch of responses
+    "UserSurvey.objects.parse_survey_responses": 3,
+    "SurveyStats.objects.rebuild": 3,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(budget, using=DEFAULT_DB_ALIAS):
+    """
+    Fail with QueryBudgetExceeded when the block runs more than ``budget``
+    queries on the ``using`` database. ``budget`` is a number or a key of
+    QUERY_BUDGETS. Yields the list of executed SQL statements.
+
+    Queries are counted with an execute wrapper, so requests made with the
+    test client inside the block are counted as well, even with DEBUG off.
+    """
+    if isinstance(budget, str):
+        budget = QUERY_BUDGETS[budget]
+
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(record):
+        yield queries
+
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(
+            "%s queries executed, the budget is %s:\n%s"
+            % (
+                len(queries),
+                budget,
+                "\n".join(f"{i}. {sql}" for i, sql in enumerate(queries, 1)),
+            )
+        )
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+from django.db import models
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def iter_unique_pks(objects, chunk_size=2000):
+    """
+    Yield the distinct primary keys of a queryset, or of an iterable of model
+    instances and/or primary keys, in a single pass.
+    """
+    if isinstance(objects, models.QuerySet):
+        yield from (
+            objects.order_by("pk")
+            .values_list("pk", flat=True)
+            .distinct()
+            .iterator(chunk_size=chunk_size)
+        )
+        return
+
+    seen = set()
+    for obj in objects:
+        pk = getattr(obj, "pk", obj)
+        if pk not in seen:
+            seen.add(pk)
+            yield pk
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def json_digest(value):
+    if value is None:
+        return ""
+    return text_digest(json.dumps(value, sort_keys=True, separators=(",", ":")))
+
+
+class VersionedCache:
+    """
+    Thread-safe LRU cache holding one value per key, rebuilt when the version
+    of the key changes. ``maxsize`` is an int or a callable returning one.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_maxsize(self):
+        return self.maxsize() if callable(self.maxsize) else self.maxsize
+
+    def get(self, key, version, build):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        value = build()
+        with self.lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.get_maxsize():
+                self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
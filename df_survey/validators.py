@@ -0,0 +1,219 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core import exceptions
+
+from df_survey.settings import api_settings
+from df_survey.utils import VersionedCache, json_digest
+
+# Steps that finish the survey instead of moving to the next one
+TERMINAL_STEP_TYPES = ("completion",)
+
+
+@dataclass(frozen=True)
+class TaskError:
+    code: str
+    message: str
+    step: Optional[str] = None
+    rule: Optional[int] = None
+
+
+def get_step_id(step):
+    try:
+        return step["stepIdentifier"]["id"]
+    except (KeyError, TypeError):
+        return None
+
+
+def get_rule_targets(rule):
+    """Step identifiers a navigation rule can move to, None if malformed."""
+    try:
+        if rule["type"] == "conditional":
+            return list(rule["values"].values())
+        if rule["type"] == "direct":
+            return [rule["destinationStepStepIdentifier"]["id"]]
+    except (KeyError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def search(start, edges):
+    """Flags of the nodes reachable from the ``start`` nodes."""
+    seen = [False] * len(edges)
+    queue = deque(start)
+    for node in start:
+        seen[node] = True
+    while queue:
+        for node in edges[queue.popleft()]:
+            if not seen[node]:
+                seen[node] = True
+                queue.append(node)
+    return seen
+
+
+class TaskGraph:
+    """
+    Navigation graph of a SurveyKit task, indexed by step position.
+
+    Steps move to the next step unless they are completion steps or have a
+    rule: direct rules replace the next step, conditional rules add their
+    targets to it, as the next step is also the fallback for unmatched
+    answers. Node ``len(steps)`` is the end of the task.
+    """
+
+    def __init__(self, task):
+        self.steps = task.get("steps", [])
+        self.rules = task.get("rules", [])
+        self.end = len(self.steps)
+        self.index = {}
+        self.edges = []
+        self.errors = []
+
+    def error(self, code, message, step=None, rule=None):
+        self.errors.append(TaskError(code, message, step=step, rule=rule))
+
+    def add_steps(self):
+        for i, step in enumerate(self.steps):
+            step_id = get_step_id(step)
+            if step_id is None:
+                self.error("invalid_step", f"Step '{i}' has no identifier")
+            elif step_id in self.index:
+                self.error(
+                    "duplicate_step",
+                    f"Duplicate step identifier '{step_id}'",
+                    step=step_id,
+                )
+            else:
+                self.index[step_id] = i
+            terminal = step.get("type") in TERMINAL_STEP_TYPES
+            self.edges.append([] if terminal else [i + 1])
+        self.edges.append([])
+
+    def add_rules(self):
+        ruled = set()
+        for line, rule in enumerate(self.rules):
+            trigger = get_step_id({"stepIdentifier": rule.get("triggerStepIdentifier")})
+            targets = get_rule_targets(rule)
+            if trigger not in self.index:
+                self.error(
+                    "unknown_trigger",
+                    f"Invalid triggerStepIdentifier '{trigger}' in rule '{line}'",
+                    step=trigger,
+                    rule=line,
+                )
+            elif trigger in ruled:
+                self.error(
+                    "duplicate_rule",
+                    f"Step '{trigger}' has more than one rule, rule '{line}'",
+                    step=trigger,
+                    rule=line,
+                )
+            elif targets is None:
+                self.error(
+                    "invalid_rule",
+                    f"Invalid {rule.get('type')} rule '{line}'",
+                    step=trigger,
+                    rule=line,
+                )
+            else:
+                ruled.add(trigger)
+                self.add_rule(line, rule, trigger, targets)
+
+    def add_rule(self, line, rule, trigger, targets):
+        edges = self.edges[self.index[trigger]]
+        if rule["type"] == "direct":
+            edges.clear()
+        for target in targets:
+            if target in self.index:
+                edges.append(self.index[target])
+            else:
+                self.error(
+                    "unknown_target",
+                    f"Invalid target step '{target}' in rule '{line}'",
+                    step=trigger,
+                    rule=line,
+                )
+
+    def check_paths(self):
+        reachable = search([0], self.edges)
+
+        incoming = [[] for _ in self.edges]
+        for i, targets in enumerate(self.edges):
+            for j in targets:
+                incoming[j].append(i)
+        finishing = search(
+            [self.end]
+            + [
+                i
+                for i, step in enumerate(self.steps)
+                if step.get("type") in TERMINAL_STEP_TYPES
+            ],
+            incoming,
+        )
+
+        unreachable = [
+            get_step_id(step) for i, step in enumerate(self.steps) if not reachable[i]
+        ]
+        if unreachable:
+            self.error(
+                "unreachable_step",
+                "Steps can never be reached: %s"
+                % ", ".join(f"'{step_id}'" for step_id in unreachable),
+                step=unreachable[0],
+            )
+        # Every other step moves somewhere, so the ones that never finish loop
+        looping = [
+            get_step_id(step)
+            for i, step in enumerate(self.steps)
+            if reachable[i] and not finishing[i]
+        ]
+        if looping:
+            self.error(
+                "cycle",
+                "Rules loop without reaching the end of the task: %s"
+                % ", ".join(f"'{step_id}'" for step_id in looping),
+                step=looping[0],
+            )
+
+    def check(self):
+        """Return a tuple of TaskError, empty if the task is valid."""
+        if not isinstance(self.steps, list) or not isinstance(self.rules, list):
+            return (TaskError("invalid_task", "Steps and rules must be lists"),)
+        if not all(isinstance(item, dict) for item in self.steps + self.rules):
+            return (TaskError("invalid_task", "Steps and rules must be objects"),)
+
+        self.add_steps()
+        if not self.errors:
+            self.add_rules()
+        # Paths are only meaningful when every identifier resolves
+        if self.steps and not self.errors:
+            self.check_paths()
+        return tuple(self.errors)
+
+
+task_errors_cache = VersionedCache(lambda: api_settings.TASK_VALIDATION_CACHE_SIZE)
+
+
+def get_task_errors(task):
+    """
+    Errors of ``task``, memoized by its content hash so that unchanged tasks
+    are checked once. Do not modify the result.
+    """
+    # Keys are content hashes, so entries never need another version
+    return task_errors_cache.get(
+        json_digest(task), None, lambda: TaskGraph(task).check()
+    )
+
+
+def validate_task_json(task):
+    if not isinstance(task, dict):
+        raise exceptions.ValidationError("The task must be a JSON object")
+    errors = get_task_errors(task)
+    if errors:
+        raise exceptions.ValidationError(
+            [
+                exceptions.ValidationError(error.message, code=error.code)
+                for error in errors
+            ]
+        )
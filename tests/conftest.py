@@ -1,7 +1,39 @@
 import pytest
 from rest_framework.test import APIClient
 
+from df_survey.models import Question, Survey
+
+QUESTIONS = 3
+
 
 @pytest.fixture
 def client() -> APIClient:
     return APIClient()
+
+
+@pytest.fixture
+def survey():
+    """A survey of text questions, with its task generated."""
+    survey = Survey.objects.create(title="Survey")
+    Question.objects.bulk_create(
+        Question(survey=survey, question=f"Question {i}", type="text", sequence=i)
+        for i in range(QUESTIONS)
+    )
+    survey.generate_task()
+    survey.save()
+    return survey
+
+
+@pytest.fixture
+def make_result():
+    """A SurveyKit result answering ``answer`` to every question of a survey."""
+
+    def make_result(survey, answer="Answer"):
+        return {
+            "results": [
+                {"id": {"id": str(question.pk)}, "results": [{"result": answer}]}
+                for question in survey.question_set.all()
+            ]
+        }
+
+    return make_result
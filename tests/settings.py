@@ -80,6 +80,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "db.sqlite3",
+        # A file, unlike the shared in-memory database, lets concurrent test
+        # connections wait for each other's locks
+        "TEST": {"NAME": "test_db.sqlite3"},
     }
 }
 
@@ -0,0 +1,76 @@
+import re
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from df_survey.models import Question, Survey
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(client):
+    client.force_login(User.objects.create_superuser("admin", "admin@test.com", "x"))
+    return client
+
+
+@pytest.fixture
+def survey():
+    survey = Survey.objects.create(title="Survey")
+    Question.objects.create(survey=survey, question="Question", type="text")
+    survey.generate_task()
+    survey.save()
+    return survey
+
+
+def test_change_form_links_streamed_exports(admin_client, survey):
+    response = admin_client.get(f"/admin/df_survey/survey/{survey.pk}/change/")
+    links = re.findall(r'href="([^"]+\?stream=csv)"', response.content.decode())
+    assert [link.split("/")[-2] for link in links] == [
+        "export_question_responses",
+        "export_question_responses_stat",
+        "export_question_responses_analytics",
+    ]
+    for link in links:
+        response = admin_client.get(link)
+        assert response["Content-Type"] == "text/csv"
+        assert b"".join(response.streaming_content)
+
+
+def get_inputs(html):
+    return dict(
+        re.findall(r'<input type="hidden" name="([^"]+)" value="([^"]*)"', html)
+    )
+
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_import_questions(admin_client, survey, sync):
+    kept, removed = Question.objects.bulk_create(
+        Question(survey=survey, question=f"Question {i}", type="text", sequence=i)
+        for i in range(2)
+    )
+    Question.objects.exclude(pk__in=[kept.pk, removed.pk]).delete()
+    url = f"/admin/df_survey/survey/{survey.pk}/"
+    page = admin_client.get(f"{url}import_questions/").content.decode()
+    csv_format = re.search(r'<option value="(\d+)">csv</option>', page).group(1)
+
+    upload = SimpleUploadedFile(
+        "questions.csv",
+        f"id,question,text,type,format\n{kept.pk},Renamed,,text,\n,New,,text,\n".encode(),
+    )
+    data = {"import_file": upload, "format": csv_format}
+    if sync:
+        data["sync"] = "on"
+    response = admin_client.post(f"{url}import_questions/", data)
+    confirm = get_inputs(response.content.decode())
+    assert confirm["sync"] == ("True" if sync else "False")
+
+    response = admin_client.post(f"{url}process_import_questions/", confirm)
+    assert response.status_code == 302
+    questions = set(survey.question_set.values_list("question", flat=True))
+    assert questions == (
+        {"Renamed", "New"} if sync else {"Renamed", "New", "Question 1"}
+    )
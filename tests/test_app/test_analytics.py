@@ -0,0 +1,136 @@
+from datetime import date
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from df_survey import models
+from df_survey.admin import QuestionResponseStatResource
+from df_survey.models import Question, Response, Survey, UserSurvey
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+def answer(question, responses):
+    users = User.objects.bulk_create(
+        User(username=f"{question.pk}-{i}") for i in range(len(responses))
+    )
+    user_surveys = UserSurvey.objects.bulk_create(
+        UserSurvey(user=user, survey=question.survey) for user in users
+    )
+    Response.objects.bulk_create(
+        Response(usersurvey=user_survey, question=question, response=response)
+        for user_survey, response in zip(user_surveys, responses)
+    )
+
+
+@pytest.fixture
+def survey():
+    return Survey.objects.create(title="Survey")
+
+
+def test_integer_analytics(survey):
+    question = Question.objects.create(
+        survey=survey, question="Integer", type="integer", format="0..9"
+    )
+    answer(question, ["0", "1", "2", "2", "3", "5", "8", "9", "12", "-3", "x", ""])
+
+    (question,) = survey.get_responses_analytics()
+    analytics = question.analytics
+    assert (analytics.count, analytics.min, analytics.max) == (10, -3, 12)
+    assert analytics.mean == 3.9
+    assert 2 <= analytics.median <= 3
+    # Answers out of the declared range are counted in the first or last bucket
+    assert analytics.histogram == [
+        (i, i, count) for i, count in enumerate([2, 1, 2, 1, 0, 1, 0, 0, 1, 2])
+    ]
+
+
+def test_date_analytics(survey):
+    question = Question.objects.create(survey=survey, question="Date", type="date")
+    Question.objects.create(survey=survey, question="Empty", type="date")
+    Question.objects.create(survey=survey, question="Text", type="text")
+    answer(
+        question,
+        [
+            "2024-01-01",
+            "2024-01-31T00:00:00.000",
+            "2024-02-29",
+            # Not dates
+            "2024-13-45",
+            "2024-02-30",
+            "2023-02-29",
+            "0000-01-01",
+            "January",
+        ],
+    )
+
+    questions = {q.question: q for q in survey.get_responses_analytics()}
+    assert set(questions) == {"Date", "Empty"}
+    assert questions["Empty"].analytics is None
+    analytics = questions["Date"].analytics
+    assert analytics.count == 3
+    assert (analytics.min, analytics.max) == (date(2024, 1, 1), date(2024, 2, 29))
+    assert analytics.histogram[0] == (date(2024, 1, 1), date(2024, 1, 6), 1)
+    assert sum(count for *_, count in analytics.histogram) == 3
+
+
+def test_date_analytics_skip_null_values(survey, monkeypatch):
+    # Answers the database cannot cast are dropped, not grouped as a bucket
+    monkeypatch.setattr(models, "DATE_RESPONSE_REGEX", r"^[0-9]{4}-[0-9]{2}-[0-9]{2}")
+    question = Question.objects.create(survey=survey, question="Date", type="date")
+    answer(question, ["2024-01-01", "2024-13-45", "2024-01-11"])
+
+    (question,) = survey.get_responses_analytics()
+    assert question.analytics.count == 2
+    assert question.analytics.max == date(2024, 1, 11)
+
+
+def test_response_stats_keep_question_attributes(survey):
+    question = Question.objects.create(survey=survey, question="Name", type="text")
+    answer(question, ["Question", "Yes", "Yes", "pk"])
+
+    (stats,) = survey.get_responses_stats()
+    assert (stats.question, stats.pk) == ("Name", question.pk)
+    assert getattr(stats, "response-question") == 1
+    assert getattr(stats, "response-pk_p") == 25.0
+    assert (stats.yes, stats.yes_p) == (2, 50.0)
+
+    dataset = QuestionResponseStatResource(survey=survey).export(
+        survey.get_responses_stats()
+    )
+    assert dataset.headers == [
+        "question",
+        "#Question",
+        "%Question",
+        "#Yes",
+        "%Yes",
+        "#pk",
+        "%pk",
+    ]
+    assert dataset[0] == ("Name", "1", "25.0", "2", "50.0", "1", "25.0")
+
+
+def test_response_stats_shared_slug_columns(survey):
+    question = Question.objects.create(survey=survey, question="Name", type="text")
+    answer(question, ["Yes", "Yes", "yes"])
+
+    # The export column and the annotated counts are those of the same answer
+    resource = QuestionResponseStatResource(survey=survey)
+    column = resource.fields["yes"].column_name[1:]
+    (stats,) = survey.get_responses_stats()
+    assert stats.yes == ["Yes", "Yes", "yes"].count(column)
+    assert column == survey.question_set.all().get_responses()[-1]
+
+
+def test_epoch_days_on_mysql():
+    query = Response.objects.all().query
+    compiler = query.get_compiler(using="default")
+    sql, _ = (
+        models.EpochDays("response")
+        .resolve_expression(query)
+        .as_mysql(compiler, compiler.connection)
+    )
+    assert sql.startswith("DATEDIFF(CAST(")
+    assert sql.endswith(" AS date), '1970-01-01')")
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from df_survey.models import AssignmentJob, UserSurvey, UserSurveyManager
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+USERS = 5
+
+
+@pytest.fixture
+def users():
+    return User.objects.bulk_create(User(username=f"user{i}") for i in range(USERS))
+
+
+@pytest.fixture
+def job(survey, users):
+    job = AssignmentJob.objects.create(survey=survey)
+    job.users.set(users)
+    return job
+
+
+@pytest.fixture
+def progress():
+    """The users_assigned and last_user_id stored before every batch."""
+    bulk_assign = UserSurveyManager.bulk_assign
+    progress = []
+
+    def record(manager, survey, users, **kwargs):
+        job = AssignmentJob.objects.get()
+        progress.append((job.users_assigned, job.last_user_id, len(users)))
+        return bulk_assign(manager, survey, users, **kwargs)
+
+    with mock.patch.object(UserSurveyManager, "bulk_assign", record):
+        yield progress
+
+
+def assigned_users(survey):
+    return set(
+        UserSurvey.objects.filter(survey=survey).values_list("user_id", flat=True)
+    )
+
+
+def test_run_in_chunks(job, users, progress):
+    job.run(batch_size=2)
+
+    assert progress == [
+        (0, "", 2),
+        (2, str(users[1].pk), 2),
+        (4, str(users[3].pk), 1),
+    ]
+    job.refresh_from_db()
+    assert job.status == AssignmentJob.Status.completed
+    assert (job.users_total, job.users_assigned) == (USERS, USERS)
+    assert job.last_user_id == str(users[-1].pk)
+    assert assigned_users(job.survey) == {user.pk for user in users}
+
+
+def test_resume(job, users, progress):
+    # A worker stopped after the first three users
+    job.users_total = USERS
+    job.users_assigned = 3
+    job.last_user_id = str(users[2].pk)
+    job.save()
+
+    job.run(batch_size=10)
+
+    assert progress == [(3, str(users[2].pk), 2)]
+    assert assigned_users(job.survey) == {users[3].pk, users[4].pk}
+    job.refresh_from_db()
+    assert (job.status, job.users_assigned) == (AssignmentJob.Status.completed, 5)
+
+
+def test_claim(survey):
+    running = AssignmentJob.objects.create(
+        survey=survey, status=AssignmentJob.Status.running
+    )
+    pending = AssignmentJob.objects.create(survey=survey)
+    assert AssignmentJob.objects.claim() == pending
+    assert AssignmentJob.objects.get(pk=pending.pk).status == "running"
+    # The running jobs are still reporting progress
+    assert AssignmentJob.objects.claim() is None
+
+    # update() keeps modified as is
+    AssignmentJob.objects.filter(pk=running.pk).update(
+        modified=timezone.now() - timedelta(hours=1)
+    )
+    assert AssignmentJob.objects.claim() == running
+    assert AssignmentJob.objects.claim() is None
+
+
+def test_failed(job):
+    with mock.patch.object(
+        UserSurveyManager, "bulk_assign", side_effect=ValueError("Broken")
+    ):
+        with pytest.raises(ValueError):
+            job.run()
+
+    job.refresh_from_db()
+    assert (job.status, job.error) == (AssignmentJob.Status.failed, "Broken")
+    assert job.users_assigned == 0
+
+
+def test_command(job, users, survey):
+    failing = AssignmentJob.objects.create(survey=survey, all_users=True)
+    stdout, stderr = StringIO(), StringIO()
+    bulk_assign = UserSurveyManager.bulk_assign
+
+    def fail_all_users(manager, survey, users, **kwargs):
+        if AssignmentJob.objects.get(pk=failing.pk).status == "running":
+            raise ValueError("Broken")
+        return bulk_assign(manager, survey, users, **kwargs)
+
+    with mock.patch.object(UserSurveyManager, "bulk_assign", fail_all_users):
+        call_command("run_assignment_jobs", "--once", stdout=stdout, stderr=stderr)
+
+    assert f"Assignment job {job.pk} assigned {USERS} users" in stdout.getvalue()
+    assert f"Assignment job {failing.pk} failed: Broken" in stderr.getvalue()
+    assert AssignmentJob.objects.get(pk=job.pk).status == "completed"
+    assert AssignmentJob.objects.get(pk=failing.pk).status == "failed"
+
+
+def test_assign_users_view_queues_a_job(client, survey, users):
+    client.force_login(User.objects.create_superuser("admin", "admin@test.com", "x"))
+    response = client.post(
+        f"/admin/df_survey/survey/{survey.pk}/assign_users/",
+        {"users": [user.pk for user in users[:2]]},
+    )
+    assert response.status_code == 302
+
+    job = AssignmentJob.objects.get()
+    assert job.status == AssignmentJob.Status.pending
+    assert set(job.users.all()) == set(users[:2])
+    assert not assigned_users(survey)
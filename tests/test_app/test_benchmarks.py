@@ -0,0 +1,317 @@
+"""
+Benchmarks of the hot paths on a large, deterministic survey.
+
+Skipped unless ``DF_SURVEY_BENCHMARK`` names the JSON file to write the
+results to::
+
+    DF_SURVEY_BENCHMARK=benchmark.json pytest tests/test_app/test_benchmarks.py
+
+``DF_SURVEY_BENCHMARK_USERS`` (default 3000) and ``DF_SURVEY_BENCHMARK_ROUNDS``
+(default 3) scale the fixture and the number of timed rounds.
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+import pytest
+import tablib
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+
+from df_survey.admin import QuestionResource, QuestionResponseResource
+from df_survey.models import (
+    Question,
+    Response,
+    Survey,
+    SurveyStats,
+    UserSurvey,
+)
+from df_survey.renderers import SurveyKitRenderer
+from df_survey.streaming import iter_csv, iter_export_rows
+
+User = get_user_model()
+
+OUTPUT = os.environ.get("DF_SURVEY_BENCHMARK")
+USERS = int(os.environ.get("DF_SURVEY_BENCHMARK_USERS", 3000))
+ROUNDS = int(os.environ.get("DF_SURVEY_BENCHMARK_ROUNDS", 3))
+QUESTIONS = 100
+IMPORTED_QUESTIONS = 5000
+LIST_SURVEYS = 200
+SEED = 1234
+BATCH_SIZE = 5000
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(not OUTPUT, reason="DF_SURVEY_BENCHMARK is not set"),
+]
+
+QUESTION_TYPES = [
+    ("text", ""),
+    ("single", "Yes|No|Maybe"),
+    ("multi", "Red|Green|Blue"),
+    ("integer", "0..10"),
+    ("date", ""),
+]
+
+
+def answer(rng, question_type):
+    """Return the SurveyKit result and the parsed response of an answer."""
+    if question_type == "single":
+        value = rng.choice(["Yes", "No", "Maybe"])
+        return [{"text": value, "value": value}], value
+    if question_type == "multi":
+        values = rng.sample(["Red", "Green", "Blue"], rng.randint(1, 3))
+        result = [{"text": value, "value": value} for value in values]
+        return result, ", ".join(values)
+    if question_type == "integer":
+        value = rng.randint(0, 10)
+        return value, str(value)
+    if question_type == "date":
+        value = (date(2020, 1, 1) + timedelta(days=rng.randint(0, 1500))).isoformat()
+        return value, value
+    value = f"Answer {rng.randint(0, 50)}"
+    return value, value
+
+
+def build_dataset():
+    rng = random.Random(SEED)  # noqa: S311
+    survey = Survey.objects.create(title="Benchmark", description="Benchmark")
+    questions = Question.objects.bulk_create(
+        Question(
+            survey=survey,
+            sequence=i,
+            question=f"Question {i}",
+            text=f"Text of question {i}",
+            type=QUESTION_TYPES[i % len(QUESTION_TYPES)][0],
+            format=QUESTION_TYPES[i % len(QUESTION_TYPES)][1],
+        )
+        for i in range(QUESTIONS)
+    )
+    questions = list(survey.question_set.all())
+    survey.task = SurveyKitRenderer.generate_task_from_survey(survey)
+    survey.task["steps"][0]["text"] = "Hello {{ user.username }}"
+    survey.save()
+
+    User.objects.bulk_create(
+        User(username=f"benchmark{i}", email=f"benchmark{i}@test.com")
+        for i in range(USERS)
+    )
+    users = list(User.objects.filter(username__startswith="benchmark").order_by("pk"))
+
+    completed_at = timezone.now()
+    user_surveys = []
+    responses = {}
+    for user in users:
+        results = []
+        for question in questions:
+            result, response = answer(rng, question.type)
+            results.append(
+                {"id": {"id": str(question.pk)}, "results": [{"result": result}]}
+            )
+            responses[user.pk, question.pk] = response
+        user_surveys.append(
+            UserSurvey(
+                user=user,
+                survey=survey,
+                result={"results": results},
+                completed_at=completed_at,
+            )
+        )
+    UserSurvey.objects.bulk_create(user_surveys, batch_size=BATCH_SIZE)
+
+    Response.objects.bulk_create(
+        (
+            Response(
+                usersurvey=user_survey,
+                question_id=question_id,
+                response=responses[user_id, question_id],
+            )
+            for user_survey in survey.usersurvey_set.all()
+            for user_id, question_id in [
+                (user_survey.user_id, question.pk) for question in questions
+            ]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    # Surveys listed by the API for the first user
+    list_surveys = Survey.objects.bulk_create(
+        Survey(title=f"Listed {i}", task={"steps": []}) for i in range(LIST_SURVEYS)
+    )
+    UserSurvey.objects.bulk_create(
+        UserSurvey(user=users[0], survey=listed) for listed in list_surveys
+    )
+    SurveyStats.objects.rebuild()
+    return survey, users
+
+
+class Benchmark:
+    def __init__(self):
+        self.results = {}
+
+    def __call__(self, name, fn, rounds=ROUNDS):
+        # An untimed round warms the caches and counts the queries
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            fn()
+
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+        self.results[name] = {
+            "rounds": rounds,
+            "queries": len(queries),
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.mean(timings),
+            "median": statistics.median(timings),
+        }
+
+    def write(self, path, dataset):
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "environment": {
+                        "python": platform.python_version(),
+                        "django": django.get_version(),
+                        "database": connection.vendor,
+                    },
+                    "dataset": dataset,
+                    "results": self.results,
+                },
+                file,
+                indent=2,
+            )
+
+
+@pytest.fixture(scope="module")
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        survey, users = build_dataset()
+        yield survey, users
+        Survey.objects.filter(pk=survey.pk).delete()
+        Survey.objects.filter(title__startswith="Listed ").delete()
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+
+@pytest.fixture(scope="module")
+def benchmark(dataset):
+    benchmark = Benchmark()
+    yield benchmark
+    benchmark.write(
+        OUTPUT,
+        {
+            "users": USERS,
+            "questions": QUESTIONS,
+            "responses": USERS * QUESTIONS,
+            "listed_surveys": LIST_SURVEYS,
+            "imported_questions": IMPORTED_QUESTIONS,
+            "seed": SEED,
+        },
+    )
+
+
+@pytest.fixture
+def user_survey(dataset):
+    survey, users = dataset
+    return UserSurvey.objects.get(survey=survey, user=users[0])
+
+
+def test_get_task(benchmark, user_survey):
+    survey = Survey.objects.get(pk=user_survey.survey_id)
+    benchmark(
+        "get_task",
+        lambda: SurveyKitRenderer.render_task(survey, {"user": user_survey.user}),
+    )
+
+
+def test_pretty_results(benchmark, user_survey):
+    benchmark("pretty_results", user_survey.pretty_results)
+
+
+def test_get_step_titles(benchmark, user_survey):
+    # The step titles of every result parsed for the same survey instance
+    benchmark("get_step_titles", user_survey.survey.get_step_titles)
+
+
+def test_parse_survey_response(benchmark, user_survey):
+    benchmark("parse_survey_response", user_survey.parse_survey_response)
+
+
+def test_annotate_responses_stats(benchmark, dataset):
+    survey, _ = dataset
+    benchmark(
+        "annotate_responses_stats",
+        lambda: survey.question_set.all().annotate_responses_stats(),
+    )
+
+
+def test_annotate_responses_analytics(benchmark, dataset):
+    survey, _ = dataset
+    benchmark(
+        "annotate_responses_analytics",
+        lambda: survey.question_set.all().annotate_responses_analytics(),
+    )
+
+
+def test_response_export(benchmark, dataset):
+    survey, _ = dataset
+
+    def export():
+        resource = QuestionResponseResource(survey=survey)
+        for _ in iter_csv(iter_export_rows(resource, survey.get_responses())):
+            pass
+
+    benchmark("response_export", export)
+
+
+def test_question_import(benchmark, dataset):
+    imported = tablib.Dataset(headers=["id", "question", "text", "type", "format"])
+    for i in range(IMPORTED_QUESTIONS):
+        question_type, question_format = QUESTION_TYPES[i % len(QUESTION_TYPES)]
+        imported.append(["", f"Question {i}", "", question_type, question_format])
+
+    def run():
+        survey = Survey.objects.create(title="Imported")
+        result = QuestionResource().import_data(
+            imported, use_transactions=True, survey=survey, question_ids=set()
+        )
+        assert not result.has_errors()
+
+    benchmark("question_import", run)
+    Survey.objects.filter(title="Imported").delete()
+
+
+def test_list(benchmark, client, dataset):
+    _, users = dataset
+    client.force_login(users[0])
+
+    def get():
+        assert client.get("/api/v1/surveys/user-surveys/").status_code == 200
+
+    benchmark("list", get)
+
+
+def test_retrieve(benchmark, client, user_survey):
+    client.force_login(user_survey.user)
+    path = f"/api/v1/surveys/user-surveys/{user_survey.pk}/"
+
+    def get():
+        assert client.get(path).status_code == 200
+
+    benchmark("retrieve", get)
@@ -0,0 +1,144 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from df_survey.models import Category, Question, Response, Survey, UserSurvey
+from df_survey.validators import validate_task_json
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def surveys(make_result):
+    surveys = []
+    for i in range(2):
+        survey = Survey.objects.create(title=f"Survey {i}")
+        Question.objects.create(survey=survey, question="Question", type="text")
+        survey.generate_task()
+        survey.save()
+        surveys.append(survey)
+
+    # Interleaved ids, so that the ranges of a survey cover the other one;
+    # bulk_create skips the signals and leaves the results unparsed
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(10))
+    UserSurvey.objects.bulk_create(
+        UserSurvey(
+            user=user,
+            survey=surveys[i % 2],
+            result=make_result(surveys[i % 2]),
+            completed_at=timezone.now(),
+        )
+        for i, user in enumerate(users)
+    )
+    return surveys
+
+
+def reparse(tmp_path, *args):
+    call_command(
+        "reparse_survey_responses",
+        "--processes=1",
+        "--batch-size=2",
+        f"--checkpoint={tmp_path / 'checkpoint.json'}",
+        *args,
+    )
+
+
+def test_reparse_survey(tmp_path, surveys):
+    reparse(tmp_path, f"--survey={surveys[0].pk}")
+
+    assert Response.objects.filter(usersurvey__survey=surveys[0]).count() == 5
+    assert not Response.objects.filter(usersurvey__survey=surveys[1]).exists()
+
+
+def test_reparse_resume(tmp_path, surveys):
+    path = tmp_path / "checkpoint.json"
+    ids = [
+        str(pk) for pk in UserSurvey.objects.order_by("pk").values_list("pk", flat=True)
+    ]
+    path.write_text(
+        json.dumps(
+            {
+                "surveys": [],
+                "ranges": [ids[i : i + 2] for i in range(0, len(ids), 2)],
+                "done": [0, 1],
+            }
+        )
+    )
+
+    reparse(tmp_path)
+
+    parsed = set(Response.objects.values_list("usersurvey_id", flat=True))
+    assert parsed == set(
+        UserSurvey.objects.filter(pk__in=ids[4:]).values_list("pk", flat=True)
+    )
+    assert json.loads(path.read_text())["done"] == [0, 1, 2, 3, 4]
+
+
+def test_reparse_checkpoint_of_other_surveys(tmp_path, surveys):
+    reparse(tmp_path, f"--survey={surveys[0].pk}")
+    with pytest.raises(CommandError, match="other surveys"):
+        reparse(tmp_path)
+
+
+def seed(seed=7):
+    call_command(
+        "seed_survey_load",
+        f"--seed={seed}",
+        "--categories=2",
+        "--surveys=2",
+        "--questions=6",
+        "--users=12",
+        "--completion=0.5",
+        stdout=StringIO(),
+    )
+    return Survey.objects.filter(title__startswith=f"load{seed}_")
+
+
+def get_load(surveys):
+    return {
+        "user_surveys": UserSurvey.objects.filter(survey__in=surveys).count(),
+        "completed": UserSurvey.objects.filter(
+            survey__in=surveys, completed_at__isnull=False
+        ).count(),
+        "responses": sorted(
+            Response.objects.filter(question__survey__in=surveys).values_list(
+                "usersurvey__user__username", "question__question", "response"
+            )
+        ),
+    }
+
+
+def test_seed_survey_load_is_deterministic():
+    load = get_load(seed())
+    assert load["responses"]
+    assert 0 < load["completed"] < load["user_surveys"] == 24
+
+    Survey.objects.filter(title__startswith="load7_").delete()
+    Category.objects.filter(slug__startswith="load7_").delete()
+    User.objects.filter(username__startswith="load7_").delete()
+    assert get_load(seed()) == load
+    assert get_load(seed(8)) != load
+
+
+def test_seed_survey_load_data():
+    surveys = seed()
+    for survey in surveys:
+        validate_task_json(survey.task)
+
+    user_surveys = UserSurvey.objects.filter(survey__in=surveys, result__isnull=False)
+    assert user_surveys
+    for user_survey in user_surveys:
+        # The raw inserts hold the rows that parsing the result would create
+        expected = {
+            (response.question_id, str(response.response))
+            for response in user_survey.get_survey_responses()
+        }
+        assert expected == set(
+            user_survey.response_set.values_list("question_id", "response")
+        )
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connections
+from rest_framework.test import APIClient
+
+from df_survey.models import (
+    Response,
+    Survey,
+    SurveyStats,
+    UserSurvey,
+)
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+THREADS = 8
+ROUNDS = 5
+API_URL = "/api/v1/surveys/user-surveys/"
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def run_concurrently(calls):
+    """Run each of ``calls`` in its own thread, all released at once."""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call):
+        try:
+            barrier.wait()
+            return call()
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(len(calls)) as executor:
+        return list(executor.map(run, calls))
+
+
+def test_concurrent_submissions(survey, make_result):
+    for round_ in range(ROUNDS):
+        user = User.objects.create(username=f"user{round_}")
+        (user_survey,) = UserSurvey.objects.bulk_assign(survey, [user], notify=False)
+        url = f"{API_URL}{user_survey.pk}/"
+
+        responses = run_concurrently(
+            [
+                partial(
+                    client_for(user).patch,
+                    url,
+                    {"result": make_result(survey, f"Answer {i}")},
+                    format="json",
+                )
+                for i in range(THREADS)
+            ]
+        )
+        statuses = sorted(response.status_code for response in responses)
+        assert statuses == [200] + [409] * (THREADS - 1)
+
+        winner = next(r for r in responses if r.status_code == 200).json()
+        user_survey.refresh_from_db()
+        assert user_survey.result == winner["result"]
+        assert user_survey.response_set.count() == 3
+
+    stats = SurveyStats.objects.get(survey=survey)
+    assert (stats.users_total, stats.users_completed) == (ROUNDS, ROUNDS)
+    assert Response.objects.count() == ROUNDS * 3
+
+
+def test_concurrent_get_or_assign(survey):
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(ROUNDS))
+    url = f"{API_URL}@{survey.pk}/"
+    for user in users:
+        responses = run_concurrently(
+            [partial(client_for(user).get, url) for _ in range(THREADS)]
+        )
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.json()["id"] for response in responses}) == 1
+
+    assert UserSurvey.objects.filter(survey=survey).count() == ROUNDS
+    assert SurveyStats.objects.get(survey=survey).users_total == ROUNDS
+
+
+def test_concurrent_first_assignments():
+    # Every user opens a new survey at once: none of the increments is lost
+    survey = Survey.objects.create(title="Launch", task={"steps": []})
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(THREADS))
+    url = f"{API_URL}@{survey.pk}/"
+    responses = run_concurrently([partial(client_for(user).get, url) for user in users])
+    assert {response.status_code for response in responses} == {200}
+    assert SurveyStats.objects.get(survey=survey).users_total == THREADS
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from df_survey.models import (
+    Response,
+    ResponseOutbox,
+    UserSurvey,
+)
+from df_survey.settings import api_settings
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def defer_parsing(monkeypatch):
+    monkeypatch.setattr(api_settings, "DEFER_RESPONSE_PARSING", True, raising=False)
+
+
+@pytest.fixture
+def user_surveys(survey, make_result):
+    users = User.objects.bulk_create(User(username=f"user{i}") for i in range(3))
+    user_surveys = UserSurvey.objects.bulk_assign(survey, users, notify=False)
+    for user_survey in user_surveys:
+        user_survey.result = make_result(survey)
+        user_survey.save()
+    return user_surveys
+
+
+def test_enqueue(user_surveys):
+    assert ResponseOutbox.objects.count() == 3
+    assert not Response.objects.exists()
+
+    # Saving the result again keeps a single entry
+    user_surveys[0].save()
+    assert ResponseOutbox.objects.count() == 3
+
+
+def test_process(user_surveys):
+    assert ResponseOutbox.objects.process(batch_size=2) == 2
+    assert ResponseOutbox.objects.process(batch_size=2) == 1
+    assert ResponseOutbox.objects.process() == 0
+
+    assert not ResponseOutbox.objects.exists()
+    assert Response.objects.count() == 9
+
+
+def test_process_command(user_surveys):
+    call_command("process_response_outbox", "--once")
+    assert not ResponseOutbox.objects.exists()
+    assert Response.objects.count() == 9
+
+
+def test_process_is_idempotent(user_surveys):
+    user_surveys[0].parse_survey_response()
+    Response.objects.filter(usersurvey=user_surveys[0]).update(response="Kept")
+
+    ResponseOutbox.objects.process()
+    # Responses already parsed are not written again
+    assert set(
+        Response.objects.filter(usersurvey=user_surveys[0]).values_list(
+            "response", flat=True
+        )
+    ) == {"Kept"}
+    assert Response.objects.count() == 9
+
+
+def test_retry_with_backoff(user_surveys):
+    with mock.patch.object(
+        UserSurvey, "parse_survey_response_once", side_effect=ValueError("Broken")
+    ):
+        assert ResponseOutbox.objects.process() == 3
+
+    entry = ResponseOutbox.objects.get(usersurvey=user_surveys[0])
+    assert (entry.attempts, entry.last_error) == (1, "Broken")
+    assert entry.available_at > timezone.now() + timedelta(seconds=30)
+    assert not Response.objects.exists()
+
+    # Not available before the backoff delay
+    assert ResponseOutbox.objects.process() == 0
+
+    ResponseOutbox.objects.update(available_at=timezone.now())
+    assert ResponseOutbox.objects.process() == 3
+    assert not ResponseOutbox.objects.exists()
+    assert Response.objects.count() == 9
+
+
+def test_max_attempts(user_surveys):
+    ResponseOutbox.objects.update(attempts=2)
+    assert ResponseOutbox.objects.process(max_attempts=2) == 0
+    assert ResponseOutbox.objects.count() == 3
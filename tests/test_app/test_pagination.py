@@ -0,0 +1,100 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import LimitOffsetPagination
+
+from df_survey.drf.pagination import UserSurveyCursorPagination
+from df_survey.drf.viewsets import UserSurveyViewSet
+from df_survey.models import Survey, UserSurvey
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+API_URL = "/api/v1/surveys/user-surveys/"
+ROWS = 7
+
+
+@pytest.fixture
+def user(client):
+    user = User.objects.create(username="user")
+    surveys = Survey.objects.bulk_create(
+        Survey(title=f"Survey {i}", task={"steps": []}) for i in range(ROWS)
+    )
+    for survey in surveys:
+        UserSurvey.objects.bulk_assign(survey, [user], notify=False)
+    client.force_login(user)
+    return user
+
+
+@pytest.fixture
+def cursor_pagination(monkeypatch):
+    monkeypatch.setattr(
+        UserSurveyViewSet, "pagination_class", UserSurveyCursorPagination
+    )
+
+
+def get_titles(response):
+    return [row["title"] for row in response.json()["results"]]
+
+
+def test_limit_offset_by_default(client, user):
+    response = client.get(API_URL, {"limit": 3, "offset": 3})
+    assert response.json()["count"] == ROWS
+    assert len(get_titles(response)) == 3
+
+
+def test_cursor_pages(client, user, cursor_pagination):
+    titles = []
+    url = f"{API_URL}?page_size=3"
+    while url:
+        response = client.get(url)
+        titles += get_titles(response)
+        url = response.json()["next"]
+    assert sorted(titles) == sorted(f"Survey {i}" for i in range(ROWS))
+    assert "count" not in response.json()
+
+    previous = client.get(response.json()["previous"])
+    assert get_titles(previous) == titles[3:6]
+
+
+@pytest.mark.usefixtures("cursor_pagination")
+@pytest.mark.parametrize("pagination", ["limit_offset", "cursor"])
+def test_list_etag_reads_the_page(client, user, pagination, monkeypatch):
+    if pagination == "limit_offset":
+        monkeypatch.undo()
+        params = {"limit": 3}
+    else:
+        params = {"page_size": 3}
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(API_URL, params)
+    etag_sql = next(
+        query["sql"]
+        for query in context.captured_queries
+        if '"survey__task_hash"' in query["sql"]
+    )
+    assert "LIMIT 3" in etag_sql or "LIMIT 4" in etag_sql
+
+    etag = response["ETag"]
+    assert client.get(API_URL, params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    # Renaming a survey of the page changes the ETag
+    Survey.objects.filter(title=get_titles(response)[0]).update(title="Renamed")
+    assert client.get(API_URL, params, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_unpaginated_list(client, user, monkeypatch):
+    class UnpaginatedLimitOffset(LimitOffsetPagination):
+        default_limit = None
+
+    monkeypatch.setattr(UserSurveyViewSet, "pagination_class", UnpaginatedLimitOffset)
+    response = client.get(API_URL)
+    assert response.status_code == 200
+    assert len(response.json()) == ROWS
+
+    etag = response["ETag"]
+    assert client.get(API_URL, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # A limit paginates again
+    assert client.get(API_URL, {"limit": 2}, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,379 @@
+import pytest
+import tablib
+from django.contrib.auth import get_user_model
+
+from df_survey.admin import QuestionResource
+from df_survey.models import (
+    AssignmentJob,
+    Category,
+    Question,
+    Response,
+    ResponseOutbox,
+    Survey,
+    SurveyStats,
+    UserSurvey,
+)
+from df_survey.testing import QueryBudgetExceeded, query_budget
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+# More rows than any budget, so that a query per row exceeds it
+ROWS = 15
+QUESTIONS = 6
+API_URL = "/api/v1/surveys/user-surveys/"
+
+
+@pytest.fixture(autouse=True)
+def file_templates(settings):
+    # Template lookups that fall through to dbtemplates would be counted
+    options = settings.TEMPLATES[0]["OPTIONS"]
+    settings.TEMPLATES = [
+        {
+            **settings.TEMPLATES[0],
+            "OPTIONS": {
+                **options,
+                "loaders": [
+                    loader
+                    for loader in options["loaders"]
+                    if not loader.startswith("dbtemplates")
+                ],
+            },
+        }
+    ]
+
+
+@pytest.fixture
+def surveys():
+    category = Category.objects.create(slug="category")
+    surveys = []
+    for i in range(ROWS):
+        survey = Survey.objects.create(title=f"Survey {i}", category=category)
+        Question.objects.bulk_create(
+            Question(survey=survey, question=f"Question {j}", type="text", sequence=j)
+            for j in range(QUESTIONS)
+        )
+        survey.generate_task()
+        survey.save()
+        surveys.append(survey)
+    return surveys
+
+
+@pytest.fixture
+def users(surveys, make_result):
+    users = [
+        User.objects.create(username=f"user{i}", email=f"user{i}@test.com")
+        for i in range(ROWS)
+    ]
+    result = make_result(surveys[0])
+    for user in users:
+        UserSurvey.objects.create(user=user, survey=surveys[0], result=result)
+    for survey in surveys[1:]:
+        UserSurvey.objects.create(user=users[0], survey=survey)
+    return users
+
+
+@pytest.fixture
+def user_survey(users, surveys):
+    return UserSurvey.objects.get(user=users[0], survey=surveys[0])
+
+
+@pytest.fixture
+def analytics_survey(surveys, users):
+    # Integer answers to the first half of the questions, dates to the rest
+    survey = surveys[0]
+    questions = list(survey.question_set.all())
+    integer_ids = {question.pk for question in questions[: QUESTIONS // 2]}
+    Question.objects.filter(pk__in=integer_ids).update(type="integer", format="0..100")
+    survey.question_set.exclude(pk__in=integer_ids).update(type="date")
+    responses = list(Response.objects.filter(question__survey=survey))
+    for i, response in enumerate(responses):
+        if response.question_id in integer_ids:
+            response.response = str(i * 7 % 101)
+        else:
+            response.response = f"2024-01-{i % 28 + 1:02d}T00:00:00.000"
+    Response.objects.bulk_update(responses, ["response"])
+    return survey
+
+
+@pytest.fixture
+def admin_client(client, users):
+    client.force_login(User.objects.create_superuser("admin", "admin@test.com", "x"))
+    return client
+
+
+def test_query_budget_exceeded(users):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            list(User.objects.all())
+            list(UserSurvey.objects.all())
+
+
+def test_query_budget_counts_requests(client, users):
+    client.force_login(users[0])
+    with query_budget(100) as queries:
+        client.get(API_URL)
+    assert queries
+
+
+# API
+
+
+def test_api_list(client, users):
+    client.force_login(users[0])
+    with query_budget("api.user_surveys.list"):
+        response = client.get(API_URL)
+    assert len(response.json()["results"]) == ROWS
+
+
+def test_api_list_not_modified(client, users):
+    client.force_login(users[0])
+    etag = client.get(API_URL)["ETag"]
+    with query_budget("api.user_surveys.list.not_modified"):
+        response = client.get(API_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_api_retrieve(client, user_survey):
+    client.force_login(user_survey.user)
+    with query_budget("api.user_surveys.retrieve"):
+        response = client.get(f"{API_URL}{user_survey.pk}/")
+    assert len(response.json()["task"]["steps"]) == QUESTIONS
+
+
+def test_api_retrieve_by_survey(client, user_survey):
+    client.force_login(user_survey.user)
+    with query_budget("api.user_surveys.retrieve.by_survey"):
+        response = client.get(f"{API_URL}@{user_survey.survey_id}/")
+    assert response.json()["id"] == str(user_survey.pk)
+
+
+def test_api_retrieve_by_survey_create(client, users, surveys):
+    client.force_login(users[1])
+    with query_budget("api.user_surveys.retrieve.by_survey.create"):
+        response = client.get(f"{API_URL}@{surveys[1].pk}/")
+    assert response.status_code == 200
+
+
+def test_api_update(client, users, surveys, make_result):
+    user_survey = UserSurvey.objects.get(user=users[0], survey=surveys[1])
+    result = make_result(surveys[1])
+    client.force_login(users[0])
+    with query_budget("api.user_surveys.update"):
+        response = client.patch(
+            f"{API_URL}{user_survey.pk}/", {"result": result}, format="json"
+        )
+    assert response.status_code == 200
+    assert user_survey.response_set.count() == QUESTIONS
+
+
+# Admin
+
+
+@pytest.mark.parametrize(
+    "model",
+    ["survey", "usersurvey", "question", "response", "assignmentjob", "responseoutbox"],
+)
+def test_admin_changelist(admin_client, surveys, users, model):
+    for survey in surveys:
+        AssignmentJob.objects.create(survey=survey, all_users=True)
+    for user_survey in UserSurvey.objects.filter(result__isnull=False):
+        ResponseOutbox.objects.enqueue(user_survey)
+
+    with query_budget(f"admin.{model}.changelist"):
+        response = admin_client.get(f"/admin/df_survey/{model}/")
+    assert response.status_code == 200
+    assert response.context["cl"].result_count >= ROWS
+
+
+def test_admin_survey_change(admin_client, surveys):
+    for _ in range(ROWS):
+        AssignmentJob.objects.create(survey=surveys[0], all_users=True)
+    with query_budget("admin.survey.change"):
+        response = admin_client.get(f"/admin/df_survey/survey/{surveys[0].pk}/change/")
+    assert response.status_code == 200
+
+
+def test_admin_usersurvey_change(admin_client, user_survey):
+    with query_budget("admin.usersurvey.change"):
+        response = admin_client.get(
+            f"/admin/df_survey/usersurvey/{user_survey.pk}/change/"
+        )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "view", ["export_question_responses", "export_question_responses_stat"]
+)
+def test_admin_survey_export(admin_client, surveys, view):
+    with query_budget(f"admin.survey.{view}"):
+        response = admin_client.get(
+            f"/admin/df_survey/survey/{surveys[0].pk}/{view}/?stream=csv"
+        )
+        content = b"".join(response.streaming_content)
+    assert len(content.splitlines()) == QUESTIONS + 1
+
+
+def test_admin_survey_export_analytics(admin_client, analytics_survey):
+    view = "export_question_responses_analytics"
+    with query_budget(f"admin.survey.{view}"):
+        response = admin_client.get(
+            f"/admin/df_survey/survey/{analytics_survey.pk}/{view}/?stream=csv"
+        )
+        content = b"".join(response.streaming_content)
+    assert len(content.splitlines()) == QUESTIONS + 1
+
+
+def test_admin_survey_create_for_all_users(admin_client, surveys):
+    with query_budget("admin.survey.action.create_for_all_users"):
+        admin_client.post(
+            "/admin/df_survey/survey/",
+            {
+                "action": "create_for_all_users",
+                "_selected_action": [survey.pk for survey in surveys],
+            },
+        )
+    assert AssignmentJob.objects.count() == ROWS
+
+
+def test_admin_survey_generate_tasks(admin_client, surveys):
+    Question.objects.filter(sequence=0).update(question="Changed")
+    with query_budget("admin.survey.action.generate_tasks"):
+        admin_client.post(
+            "/admin/df_survey/survey/",
+            {
+                "action": "generate_tasks",
+                "_selected_action": [survey.pk for survey in surveys],
+            },
+        )
+    assert all(
+        survey.task["steps"][0]["title"] == "Changed" for survey in Survey.objects.all()
+    )
+
+
+def test_admin_usersurvey_parse_survey_response(admin_client, surveys, users):
+    selected = list(
+        UserSurvey.objects.filter(survey=surveys[0]).values_list("pk", flat=True)
+    )
+    with query_budget("admin.usersurvey.action.parse_survey_response"):
+        admin_client.post(
+            "/admin/df_survey/usersurvey/",
+            {"action": "parse_survey_response", "_selected_action": selected},
+        )
+
+
+def test_admin_responseoutbox_retry(admin_client, users):
+    for user_survey in UserSurvey.objects.filter(result__isnull=False):
+        ResponseOutbox.objects.enqueue(user_survey)
+    selected = list(ResponseOutbox.objects.values_list("pk", flat=True))
+    with query_budget("admin.responseoutbox.action.retry"):
+        admin_client.post(
+            "/admin/df_survey/responseoutbox/",
+            {"action": "retry", "_selected_action": selected},
+        )
+    assert not ResponseOutbox.objects.filter(attempts__gt=0).exists()
+
+
+# Models
+
+
+def test_survey_get_respondents(surveys, users):
+    with query_budget("Survey.get_respondents"):
+        assert len(list(surveys[0].get_respondents())) == ROWS
+
+
+def test_survey_get_responses_tuple(surveys, users):
+    with query_budget("Survey.get_responses_tuple"):
+        respondents, rows = surveys[0].get_responses_tuple()
+        assert len(list(rows)) == QUESTIONS
+
+
+def test_survey_get_responses_stats(surveys, users):
+    with query_budget("Survey.get_responses_stats"):
+        assert len(surveys[0].get_responses_stats()) == QUESTIONS
+
+
+def test_survey_get_responses_analytics(analytics_survey):
+    with query_budget("Survey.get_responses_analytics"):
+        questions = analytics_survey.get_responses_analytics()
+    assert len(questions) == QUESTIONS
+    for question in questions:
+        assert question.analytics.count == ROWS
+        assert sum(count for *_, count in question.analytics.histogram) == ROWS
+
+
+def test_survey_get_step_titles(surveys):
+    survey = Survey.objects.get(pk=surveys[0].pk)
+    with query_budget("Survey.get_step_titles"):
+        assert len(survey.get_step_titles()) == QUESTIONS
+
+
+def test_survey_generate_task(surveys):
+    with query_budget("Survey.generate_task"):
+        surveys[0].generate_task()
+
+
+def test_generate_tasks(surveys):
+    Question.objects.filter(sequence=0).update(question="Changed")
+    with query_budget("Survey.objects.generate_tasks"):
+        assert Survey.objects.generate_tasks() == ROWS
+
+
+def test_question_import(surveys):
+    survey = surveys[0]
+    questions = list(survey.question_set.all())
+    dataset = tablib.Dataset(headers=["id", "question", "text", "type", "format"])
+    for question in questions[:3]:
+        dataset.append([str(question.pk), "Updated", "", "text", ""])
+    for i in range(ROWS):
+        dataset.append(["", f"New {i}", "", "text", ""])
+
+    with query_budget("QuestionResource.import_data"):
+        result = QuestionResource().import_data(
+            dataset,
+            use_transactions=True,
+            survey=survey,
+            question_ids={question.pk for question in questions},
+            sync=True,
+        )
+    assert not result.has_errors()
+    assert list(survey.question_set.values_list("question", flat=True)) == [
+        "Updated"
+    ] * 3 + [f"New {i}" for i in range(ROWS)]
+
+
+def test_user_survey_pretty_results(user_survey):
+    user_survey = UserSurvey.objects.get(pk=user_survey.pk)
+    with query_budget("UserSurvey.pretty_results"):
+        assert len(user_survey.pretty_results()) == QUESTIONS
+
+
+def test_user_survey_parse_survey_response(user_survey):
+    user_survey = UserSurvey.objects.get(pk=user_survey.pk)
+    with query_budget("UserSurvey.parse_survey_response"):
+        user_survey.parse_survey_response()
+
+
+def test_bulk_assign(surveys):
+    users = User.objects.bulk_create(
+        User(username=f"assigned{i}", email=f"assigned{i}@test.com")
+        for i in range(ROWS)
+    )
+    with query_budget("UserSurvey.objects.bulk_assign"):
+        created = UserSurvey.objects.bulk_assign(
+            surveys[0], User.objects.filter(username__startswith="assigned")
+        )
+    assert len(created) == len(users)
+
+
+def test_parse_survey_responses(users):
+    with query_budget("UserSurvey.objects.parse_survey_responses"):
+        assert UserSurvey.objects.parse_survey_responses(UserSurvey.objects.all()) == (
+            ROWS
+        )
+
+
+def test_rebuild_survey_stats(users):
+    with query_budget("SurveyStats.objects.rebuild"):
+        assert SurveyStats.objects.rebuild() == ROWS
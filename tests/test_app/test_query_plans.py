@@ -0,0 +1,133 @@
+import re
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from df_survey.models import (
+    AssignmentJob,
+    Question,
+    Response,
+    Survey,
+    UserSurvey,
+    UserSurveysReminder,
+)
+
+User = get_user_model()
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "sqlite", reason="Query plans are checked on SQLite"
+    ),
+]
+
+# "SCAN <table>" without "USING [COVERING] INDEX" reads the whole table
+FULL_SCAN = re.compile(r"^SCAN \S+$")
+
+
+def explain(fn):
+    """
+    Run ``fn`` and return the ``EXPLAIN QUERY PLAN`` details of every query
+    it made on the tables of this app.
+    """
+    with CaptureQueriesContext(connection) as context:
+        fn()
+
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or "df_survey_" not in sql:
+                continue
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+    assert plans, "No query was made"
+    return plans
+
+
+def assert_no_full_scan(plans):
+    for sql, details in plans:
+        scans = [detail for detail in details if FULL_SCAN.match(detail)]
+        assert not scans, f"{scans} in the plan of {sql}"
+
+
+def assert_uses_index(plans, index):
+    assert any(
+        f"INDEX {index} " in detail for _, details in plans for detail in details
+    ), f"{index} is not used by {[sql for sql, _ in plans]}"
+
+
+def get_index_name(model, columns):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return next(
+        name
+        for name, constraint in constraints.items()
+        if constraint["index"] and constraint["columns"] == columns
+    )
+
+
+@pytest.fixture
+def survey():
+    survey = Survey.objects.create(title="Survey", task={"steps": []})
+    questions = Question.objects.bulk_create(
+        Question(survey=survey, question=f"Question {i}", type="text", sequence=i)
+        for i in range(5)
+    )
+    for i in range(5):
+        user = User.objects.create(username=f"user{i}", email=f"user{i}@test.com")
+        user_survey = UserSurvey.objects.create(user=user, survey=survey)
+        Response.objects.bulk_create(
+            Response(usersurvey=user_survey, question=question, response="Yes")
+            for question in questions
+        )
+    return survey
+
+
+def test_response_stats(survey):
+    plans = explain(lambda: survey.question_set.all().annotate_responses_stats())
+    assert_no_full_scan(plans)
+    assert_uses_index(plans, get_index_name(Response, ["question_id"]))
+
+
+def test_respondents(survey):
+    plans = explain(lambda: list(survey.get_respondents()))
+    assert_no_full_scan(plans)
+
+
+def test_responses_pivot(survey):
+    plans = explain(lambda: list(survey.get_responses_tuple()[1]))
+    assert_no_full_scan(plans)
+
+
+def test_questions_by_sequence(survey):
+    plans = explain(lambda: list(survey.question_set.all()))
+    assert_no_full_scan(plans)
+    assert_uses_index(plans, "question_survey_sequence")
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plans[0][1]
+
+
+def test_user_survey_list(survey, client):
+    client.force_login(User.objects.get(username="user0"))
+    plans = explain(lambda: client.get("/api/v1/surveys/user-surveys/"))
+    assert_no_full_scan(plans)
+    assert_uses_index(plans, "usersurvey_user_modified")
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plans[-1][1]
+
+
+def test_reminder(survey):
+    reminder = UserSurveysReminder.objects.create(delay=timedelta(days=1))
+    plans = explain(lambda: list(reminder.get_model_queryset()))
+    assert_no_full_scan(plans)
+    assert_uses_index(plans, "usersurvey_pending_modified")
+
+
+def test_assignment_job_claim(survey):
+    AssignmentJob.objects.create(survey=survey, all_users=True)
+    plans = explain(lambda: AssignmentJob.objects.claim())
+    assert_no_full_scan(plans)
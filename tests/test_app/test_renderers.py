@@ -0,0 +1,144 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils.timezone import now
+
+from df_survey import models
+from df_survey.models import Question, Survey, UserSurvey
+from df_survey.renderers import SurveyKitRenderer
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def survey():
+    survey = Survey.objects.create(title="Survey")
+    Question.objects.bulk_create(
+        Question(survey=survey, question=f"Question {i}", type="text", sequence=i)
+        for i in range(3)
+    )
+    survey.generate_task()
+    survey.task["steps"][0]["title"] = "Hello {{ user.username }}"
+    survey.save()
+    return survey
+
+
+def test_render_task(survey):
+    user = User.objects.create(username="u0")
+    task = SurveyKitRenderer.render_task(survey, {"user": user})
+    assert task["steps"][0]["title"] == "Hello u0"
+    assert survey.get_step_titles()[task["steps"][0]["stepIdentifier"]["id"]] == (
+        "Hello {{ user.username }}"
+    )
+
+
+def test_caches_follow_task_updates(survey):
+    user = User.objects.create(username="u0")
+    step_id = survey.task["steps"][0]["stepIdentifier"]["id"]
+    SurveyKitRenderer.render_task(survey, {"user": user})
+    survey.get_step_titles()
+
+    # update() leaves task_hash stale
+    survey.task["steps"][0]["title"] = "Bye {{ user.username }}"
+    Survey.objects.filter(pk=survey.pk).update(task=survey.task)
+    survey = Survey.objects.get(pk=survey.pk)
+
+    task = SurveyKitRenderer.render_task(survey, {"user": user})
+    assert task["steps"][0]["title"] == "Bye u0"
+    assert survey.get_step_titles()[step_id] == "Bye {{ user.username }}"
+
+
+def get_rule_steps(survey):
+    survey.generate_task()
+    return [
+        (rule["triggerStepIdentifier"]["id"], rule.get("values"))
+        for rule in survey.task["rules"]
+    ]
+
+
+def test_rules_survive_regeneration(survey):
+    a, b, c = (step["stepIdentifier"]["id"] for step in survey.task["steps"])
+    survey.task["rules"] = [
+        {
+            "type": "conditional",
+            "triggerStepIdentifier": {"id": a},
+            "values": {"yes": c, "no": b},
+        },
+        {
+            "type": "direct",
+            "triggerStepIdentifier": {"id": b},
+            "destinationStepStepIdentifier": {"id": c},
+        },
+    ]
+    survey.save()
+    assert get_rule_steps(survey) == [(a, {"yes": c, "no": b}), (b, None)]
+
+    # Conditional values leading to a removed step are dropped, and so are
+    # direct rules leading to it
+    survey.question_set.get(pk=c).delete()
+    assert get_rule_steps(survey) == [(a, {"no": b})]
+
+    # Rules triggered by a removed step are dropped
+    survey.question_set.get(pk=a).delete()
+    assert get_rule_steps(survey) == []
+
+
+def test_unchanged_steps_are_not_recompiled(survey):
+    question = survey.question_set.first()
+    with mock.patch.object(
+        SurveyKitRenderer,
+        "compile_step",
+        side_effect=SurveyKitRenderer.compile_step,
+    ) as compile_step:
+        survey.generate_task()
+        assert compile_step.call_count == 0
+
+        question.question = "Changed"
+        question.save()
+        survey.generate_task()
+    assert compile_step.call_args_list == [mock.call(question)]
+    assert survey.task["steps"][0]["title"] == "Changed"
+
+
+def test_step_titles_digest_the_task_once(survey):
+    users = User.objects.bulk_create(User(username=f"u{i}") for i in range(5))
+    result = {
+        "results": [
+            {"id": {"id": step["stepIdentifier"]["id"]}, "results": [{"result": "A"}]}
+            for step in survey.task["steps"]
+        ]
+    }
+    UserSurvey.objects.bulk_create(
+        UserSurvey(user=user, survey=survey, result=result, completed_at=now())
+        for user in users
+    )
+    survey = Survey.objects.get(pk=survey.pk)
+
+    with mock.patch.object(
+        models, "json_digest", side_effect=models.json_digest
+    ) as json_digest:
+        for _ in range(3):
+            survey.get_step_titles()
+        assert json_digest.call_count == 1
+
+        # A new task object is digested again
+        survey.task = {**survey.task, "steps": survey.task["steps"][:1]}
+        assert len(survey.get_step_titles()) == 1
+        assert json_digest.call_count == 2
+
+        json_digest.reset_mock()
+        assert UserSurvey.objects.parse_survey_responses(
+            UserSurvey.objects.filter(survey=survey)
+        ) == len(users)
+        assert json_digest.call_count == 1
+
+
+@pytest.mark.parametrize("update_fields", [None, ["task"]])
+def test_save_updates_task_hash(survey, update_fields):
+    survey.task = {**survey.task, "steps": survey.task["steps"][:1]}
+    survey.save(update_fields=update_fields)
+    survey.refresh_from_db()
+    assert survey.task_hash == models.json_digest(survey.task)
@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from df_survey.models import Question, Response, Survey, UserSurvey
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def survey():
+    survey = Survey.objects.create(title="Survey")
+    # Questions sharing a sequence are ordered by id
+    Question.objects.bulk_create(
+        Question(
+            survey=survey, question=f"Question {i}", type="text", sequence=(4 - i) // 2
+        )
+        for i in range(5)
+    )
+    questions = list(survey.question_set.order_by("pk"))
+    users = User.objects.bulk_create(
+        [
+            *(User(username=f"user{i}", email=f"user{i}@test.com") for i in range(4)),
+            User(username="no-email", email=""),
+        ]
+    )
+    user_surveys = UserSurvey.objects.bulk_create(
+        UserSurvey(user=user, survey=survey) for user in users
+    )
+    # Every user skips some questions
+    Response.objects.bulk_create(
+        Response(usersurvey=user_survey, question=question, response=f"{i}-{j}")
+        for i, user_survey in enumerate(user_surveys)
+        for j, question in enumerate(questions)
+        if (i + j) % 3
+    )
+    return survey
+
+
+def get_annotated_rows(survey, users):
+    # The rows of the former per-respondent subqueries
+    return list(
+        survey.question_set.order_by("sequence", "pk")
+        .annotate_responses(users)
+        .values_list("question", *users)
+    )
+
+
+def test_responses_tuple(survey):
+    users, rows = survey.get_responses_tuple()
+    assert sorted(users) == [f"user{i}@test.com" for i in range(4)]
+    rows = list(rows)
+    assert rows == get_annotated_rows(survey, users)
+    # Unanswered cells are empty
+    assert "" in rows[0]
+    assert survey.get_responses_as_csv() == [["Question", *users], *rows]
+
+
+def test_responses(survey):
+    users = list(survey.get_respondents())
+    rows = [
+        (question.question, *(getattr(question, user) for user in users))
+        for question in survey.get_responses()
+    ]
+    assert rows == get_annotated_rows(survey, users)
@@ -0,0 +1,165 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from df_survey.models import (
+    Survey,
+    SurveyStats,
+    SurveyStatsQuerySet,
+    UserSurvey,
+    UserSurveyManager,
+    UserSurveyNotification,
+)
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+RESULT = {"results": []}
+
+
+@pytest.fixture
+def surveys():
+    surveys = [Survey.objects.create(title=f"Survey {i}") for i in range(2)]
+    for survey in surveys:
+        survey.generate_task()
+        survey.save()
+    return surveys
+
+
+@pytest.fixture
+def users():
+    return [User.objects.create(username=f"user{i}") for i in range(4)]
+
+
+def get_stats(survey):
+    stats = SurveyStats.objects.filter(survey=survey).first()
+    return (stats.users_total, stats.users_completed) if stats else None
+
+
+def assert_rebuilt_stats(surveys):
+    expected = [get_stats(survey) or (0, 0) for survey in surveys]
+    SurveyStats.objects.rebuild()
+    assert [get_stats(survey) for survey in surveys] == expected
+
+
+def test_create_and_complete(surveys, users):
+    user_survey = UserSurvey.objects.create(user=users[0], survey=surveys[0])
+    assert get_stats(surveys[0]) == (1, 0)
+
+    UserSurvey.objects.create(user=users[1], survey=surveys[0], result=RESULT)
+    assert get_stats(surveys[0]) == (2, 1)
+
+    user_survey.result = RESULT
+    user_survey.save()
+    assert get_stats(surveys[0]) == (2, 2)
+
+    user_survey.result = None
+    user_survey.save()
+    assert get_stats(surveys[0]) == (2, 1)
+    assert_rebuilt_stats(surveys)
+
+
+def test_survey_change(surveys, users):
+    user_survey = UserSurvey.objects.create(
+        user=users[0], survey=surveys[0], result=RESULT
+    )
+    user_survey.survey = surveys[1]
+    user_survey.save()
+    assert get_stats(surveys[0]) == (0, 0)
+    assert get_stats(surveys[1]) == (1, 1)
+    assert_rebuilt_stats(surveys)
+
+
+def test_delete(surveys, users):
+    user_survey = UserSurvey.objects.create(
+        user=users[0], survey=surveys[0], result=RESULT
+    )
+    UserSurvey.objects.create(user=users[1], survey=surveys[0])
+
+    user_survey.delete()
+    assert get_stats(surveys[0]) == (1, 0)
+    assert_rebuilt_stats(surveys)
+
+
+def test_bulk_delete_updates_once_per_survey(surveys, users):
+    for survey in surveys:
+        for i, user in enumerate(users):
+            UserSurvey.objects.create(
+                user=user, survey=survey, result=RESULT if i % 2 else None
+            )
+
+    with CaptureQueriesContext(connection) as context:
+        UserSurvey.objects.filter(user__in=users[1:]).delete()
+    updates = [q for q in context.captured_queries if q["sql"].startswith("UPDATE")]
+    assert len(updates) == len(surveys)
+    assert get_stats(surveys[0]) == get_stats(surveys[1]) == (1, 0)
+    assert_rebuilt_stats(surveys)
+
+    # A user delete cascades to their user surveys
+    users[0].delete()
+    assert get_stats(surveys[0]) == get_stats(surveys[1]) == (0, 0)
+
+
+def test_survey_delete_skips_stats(surveys, users):
+    for user in users:
+        UserSurvey.objects.create(user=user, survey=surveys[0])
+
+    survey_id = surveys[0].pk
+    with CaptureQueriesContext(connection) as context:
+        surveys[0].delete()
+    assert not [q for q in context.captured_queries if q["sql"].startswith("UPDATE")]
+    assert get_stats(survey_id) is None
+
+
+def test_bulk_assign_skips_concurrent_rows(surveys, users):
+    survey = surveys[0]
+    bulk_create = UserSurveyManager.bulk_create
+
+    def racing_bulk_create(manager, objs, **kwargs):
+        # get_or_assign() assigns the first user between the check and insert
+        if kwargs.get("ignore_conflicts"):
+            UserSurvey.objects.get_or_assign(users[0], survey.pk)
+        return bulk_create(manager, objs, **kwargs)
+
+    with mock.patch.object(
+        UserSurveyNotification, "perform_action", autospec=True
+    ) as perform_action:
+        with mock.patch.object(UserSurveyManager, "bulk_create", racing_bulk_create):
+            created = UserSurvey.objects.bulk_assign(survey, users[:3])
+    assert [user_survey.user for user_survey in created] == users[1:3]
+    assert get_stats(survey) == (3, 0)
+    # Once per rule, for the created rows only
+    notified = [call.args[1].user.pk for call in perform_action.call_args_list]
+    rules = UserSurveyNotification.objects.count()
+    assert rules
+    assert sorted(notified) == sorted([users[1].pk, users[2].pk] * rules)
+    assert_rebuilt_stats(surveys)
+
+
+def test_new_survey_has_stats():
+    survey = Survey.objects.create(title="New")
+    assert get_stats(survey) == (0, 0)
+
+
+def test_missing_stats_are_incremented(users):
+    # bulk_create skips Survey.save()
+    (survey,) = Survey.objects.bulk_create([Survey(title="Bulk")])
+    with mock.patch.object(SurveyStatsQuerySet, "rebuild") as rebuild:
+        UserSurvey.objects.get_or_assign(users[0], survey.pk)
+        UserSurvey.objects.get_or_assign(users[1], survey.pk)
+    assert not rebuild.called
+    assert get_stats(survey) == (2, 0)
+
+
+@pytest.mark.parametrize("update_fields", [None, ["result"]])
+def test_save_result_fields(surveys, users, update_fields):
+    user_survey = UserSurvey.objects.create(user=users[0], survey=surveys[0])
+    user_survey.result = RESULT
+    user_survey.save(update_fields=update_fields)
+    user_survey.refresh_from_db()
+    assert user_survey.completed_at is not None
+    assert get_stats(surveys[0]) == (1, 1)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+import pytest
+from django.db import transaction
+
+from df_survey.models import Question, Survey, SurveyQuerySet
+from df_survey.settings import api_settings
+
+pytestmark = pytest.mark.django_db
+
+QUESTIONS = 5
+
+
+@pytest.fixture(autouse=True)
+def auto_generate_tasks(monkeypatch):
+    monkeypatch.setattr(api_settings, "AUTO_GENERATE_TASKS", True, raising=False)
+
+
+@pytest.fixture
+def surveys():
+    return [Survey.objects.create(title=f"Survey {i}") for i in range(2)]
+
+
+def get_step_count(survey):
+    survey.refresh_from_db()
+    return len(survey.task["steps"]) if survey.task else 0
+
+
+def test_one_rebuild_per_transaction(surveys, django_capture_on_commit_callbacks):
+    with mock.patch.object(
+        SurveyQuerySet,
+        "generate_tasks",
+        autospec=True,
+        side_effect=SurveyQuerySet.generate_tasks,
+    ) as generate_tasks:
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                for survey in surveys:
+                    for i in range(QUESTIONS):
+                        Question.objects.create(
+                            survey=survey, question=f"Question {i}", type="text"
+                        )
+    assert generate_tasks.call_count == 1
+    assert [get_step_count(survey) for survey in surveys] == [QUESTIONS] * 2
+
+
+def test_rebuild_skips_broken_surveys(
+    surveys, django_capture_on_commit_callbacks, caplog
+):
+    broken, survey = surveys
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            # An info question needs a "type|button" format
+            Question.objects.create(survey=broken, question="Info", type="info")
+            Question.objects.create(survey=survey, question="Question", type="text")
+
+    assert get_step_count(broken) == 0
+    assert get_step_count(survey) == 1
+    assert f"Cannot generate the task of survey {broken.pk}" in caplog.text
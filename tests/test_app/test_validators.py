@@ -0,0 +1,91 @@
+import pytest
+from django.core import exceptions
+
+from df_survey.validators import get_task_errors, validate_task_json
+
+
+def step(step_id, step_type="question"):
+    return {"type": step_type, "stepIdentifier": {"id": step_id}}
+
+
+def direct(trigger, target):
+    return {
+        "type": "direct",
+        "triggerStepIdentifier": {"id": trigger},
+        "destinationStepStepIdentifier": {"id": target},
+    }
+
+
+def conditional(trigger, **values):
+    return {
+        "type": "conditional",
+        "triggerStepIdentifier": {"id": trigger},
+        "values": values,
+    }
+
+
+def get_codes(task):
+    return [error.code for error in get_task_errors(task)]
+
+
+def test_linear_task():
+    task = {"steps": [step("a"), step("b"), step("end", "completion")]}
+    assert get_codes(task) == []
+    validate_task_json(task)
+
+
+def test_conditional_loop_with_fallback():
+    # "no" goes back to "a", any other answer moves on to "c"
+    task = {
+        "steps": [step("a"), step("b"), step("c")],
+        "rules": [conditional("b", no="a")],
+    }
+    assert get_codes(task) == []
+
+
+def test_direct_loop():
+    task = {
+        "steps": [step("a"), step("b"), step("c")],
+        "rules": [direct("b", "a")],
+    }
+    errors = get_task_errors(task)
+    assert [error.code for error in errors] == ["unreachable_step", "cycle"]
+    assert errors[0].step == "c"
+    assert errors[1].step == "a"
+    with pytest.raises(exceptions.ValidationError) as exc_info:
+        validate_task_json(task)
+    assert [error.code for error in exc_info.value.error_list] == [
+        "unreachable_step",
+        "cycle",
+    ]
+
+
+def test_unreachable_step():
+    task = {
+        "steps": [step("a"), step("b"), step("c")],
+        "rules": [direct("a", "c")],
+    }
+    errors = get_task_errors(task)
+    assert [(error.code, error.step) for error in errors] == [("unreachable_step", "b")]
+
+
+@pytest.mark.parametrize(
+    "rule, code",
+    [
+        (direct("x", "a"), "unknown_trigger"),
+        (direct("a", "x"), "unknown_target"),
+        (conditional("a", yes="x"), "unknown_target"),
+    ],
+)
+def test_unknown_steps(rule, code):
+    task = {"steps": [step("a"), step("b")], "rules": [rule]}
+    errors = get_task_errors(task)
+    assert [(error.code, error.rule) for error in errors] == [(code, 0)]
+
+
+def test_cached_errors():
+    task = {"steps": [step("a"), step("a")]}
+    errors = get_task_errors(task)
+    assert [error.code for error in errors] == ["duplicate_step"]
+    # Equal content hits the cache
+    assert get_task_errors({"steps": [step("a"), step("a")]}) is errors